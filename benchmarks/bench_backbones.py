@@ -0,0 +1,67 @@
+"""Benchmark the supported backbones on CPU.
+
+Every backbone from ``cnnClassifier.components.backbones`` is built with
+random weights (no download) and the pooling of ``params.yaml``. Reported
+are its parameters, FLOPs of one forward pass at ``--size``, the median
+latency of a single image and the throughput of ``--batch-size`` batches.
+
+    python benchmarks/bench_backbones.py --backbones EfficientNetB0 MobileNetV3Small ResNet50
+"""
+import argparse
+import time
+import numpy as np
+import tensorflow as tf
+from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+from cnnClassifier.components.backbones import BACKBONES, build_backbone
+
+
+def count_flops(forward, input_shape):
+    concrete = forward.get_concrete_function(tf.TensorSpec((1, *input_shape), tf.float32))
+    graph = convert_variables_to_constants_v2(concrete).graph
+    options = tf.compat.v1.profiler.ProfileOptionBuilder.float_operation()
+    options['output'] = 'none'
+    return tf.compat.v1.profiler.profile(graph=graph, options=options).total_float_ops
+
+
+def time_runs(forward, batch, runs):
+    forward(batch)
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        forward(batch).numpy()
+        seconds.append(time.perf_counter() - start)
+    return float(np.median(seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backbones', nargs='+', default=sorted(BACKBONES),
+                        choices=sorted(BACKBONES))
+    parser.add_argument('--size', type=int, nargs=2, default=[224, 224])
+    parser.add_argument('--pooling', default='max')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    input_shape = (*args.size, 3)
+    rng = np.random.default_rng(0)
+    single = tf.constant(rng.uniform(0, 255, (1, *input_shape)), tf.float32)
+    batch = tf.constant(rng.uniform(0, 255, (args.batch_size, *input_shape)), tf.float32)
+    print(f"input {input_shape}, batch size {args.batch_size}, "
+          f"{tf.config.threading.get_intra_op_parallelism_threads() or 'all'} threads")
+
+    print(f"{'backbone':<18}{'params M':>10}{'GFLOPs':>10}{'ms/image':>10}{'images/s':>10}")
+    for name in args.backbones:
+        model = build_backbone(name, include_top=False, weights=None,
+                               input_shape=input_shape, pooling=args.pooling)
+        forward = tf.function(lambda x: model(x, training=False))
+        flops = count_flops(forward, input_shape)
+        latency = time_runs(forward, single, args.runs)
+        throughput = args.batch_size / time_runs(forward, batch, max(args.runs // 2, 1))
+        print(f"{name:<18}{model.count_params() / 1e6:>10.1f}{flops / 1e9:>10.2f}"
+              f"{1000 * latency:>10.1f}{throughput:>10.1f}")
+        tf.keras.backend.clear_session()
+
+
+if __name__ == '__main__':
+    main()
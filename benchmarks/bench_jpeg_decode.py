@@ -0,0 +1,89 @@
+"""Benchmark full versus DCT-reduced JPEG decoding to the training size.
+
+For every image the reference is a full-resolution OpenCV decode followed by
+an area resize to ``--size``. It is compared with the reduced decode used by
+the loaders (``IMREAD_REDUCED_COLOR_*`` then area resize) and with PIL's
+``draft`` mode. Time per image and PSNR against the reference are reported.
+
+    python benchmarks/bench_jpeg_decode.py --images artifacts/data_ingestion --limit 500
+"""
+import argparse
+import glob
+import io
+import os
+import time
+import cv2
+import numpy as np
+from PIL import Image
+from cnnClassifier.components.image_sequence import decode_image
+
+
+def full_decode(data, size):
+    return decode_image(data, size, reduced=False)
+
+
+def reduced_decode(data, size):
+    return decode_image(data, size, reduced=True)
+
+
+def pil_draft_decode(data, size):
+    image = Image.open(io.BytesIO(data))
+    image.draft('RGB', (size[1], size[0]))
+    image = np.asarray(image.convert('RGB'))
+    return cv2.resize(image, (size[1], size[0]), interpolation=cv2.INTER_AREA)
+
+
+def psnr(reference, image):
+    mse = np.mean((reference.astype(np.float64) - image.astype(np.float64)) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def synthetic_jpegs(count, shape=(1200, 1600)):
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        base = rng.integers(0, 255, (shape[0] // 40, shape[1] // 40, 3), dtype=np.uint8)
+        image = cv2.resize(base, (shape[1], shape[0]),
+                           interpolation=cv2.INTER_CUBIC)
+        images.append(cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', default=None,
+                        help='directory searched recursively for .jpg files')
+    parser.add_argument('--limit', type=int, default=200)
+    parser.add_argument('--size', type=int, nargs=2, default=[224, 224])
+    args = parser.parse_args()
+
+    if args.images:
+        paths = sorted(glob.glob(os.path.join(args.images, '**', '*.jpg'), recursive=True))
+        blobs = []
+        for path in paths[:args.limit]:
+            with open(path, 'rb') as f:
+                blobs.append(f.read())
+    else:
+        blobs = synthetic_jpegs(args.limit)
+    size = tuple(args.size)
+    print(f"{len(blobs)} images, target size {size}")
+
+    references = []
+    start = time.perf_counter()
+    for data in blobs:
+        references.append(full_decode(data, size))
+    full_seconds = time.perf_counter() - start
+
+    print(f"{'method':<16}{'ms/image':>10}{'speedup':>10}{'PSNR dB':>10}")
+    print(f"{'full':<16}{1000 * full_seconds / len(blobs):>10.2f}{1.0:>10.1f}{'ref':>10}")
+    for name, fn in [('opencv reduced', reduced_decode), ('pil draft', pil_draft_decode)]:
+        start = time.perf_counter()
+        outputs = [fn(data, size) for data in blobs]
+        seconds = time.perf_counter() - start
+        quality = np.mean([psnr(ref, out) for ref, out in zip(references, outputs)])
+        print(f"{name:<16}{1000 * seconds / len(blobs):>10.2f}"
+              f"{full_seconds / seconds:>10.1f}{quality:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
 from cnnClassifier import logger
 from cnnClassifier.pipeline.stage_01_data_ingestion import DataIngestionTrainingPipeline
 from cnnClassifier.pipeline.stage_02_prepare_base_model import PrepareBaseModelTrainingPipeline
+from cnnClassifier.pipeline.stage_03_training import ModelTrainingPipeline
+from cnnClassifier.pipeline.stage_05_quantization import QuantizationPipeline
 
 if __name__ == "__main__":
     try:
@@ -17,6 +19,14 @@ if __name__ == "__main__":
         prepare_base_model_pipeline.run()
         logger.info(
             f">>>>>> stage Prepare Base Model completed <<<<<<\n\nx==========x")
+
+        # Run training pipeline
+        model_training_pipeline = ModelTrainingPipeline()
+        model_training_pipeline.run()
+
+        # Run int8 quantization pipeline
+        quantization_pipeline = QuantizationPipeline()
+        quantization_pipeline.run()
     except Exception as e:
         logger.exception(e)
         raise e
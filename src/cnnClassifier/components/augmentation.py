@@ -0,0 +1,113 @@
+import cv2
+import numpy as np
+import tensorflow as tf
+
+
+def sample_generator(seed, epoch, sample):
+    """counter-based Philox generator for one sample of one epoch
+
+    The key is the seed and the counter starts at (0, 0, sample, epoch), so
+    the random numbers of a sample depend only on these three values and not
+    on which process or in which order the sample is drawn.
+    """
+    return np.random.Generator(np.random.Philox(key=seed, counter=[0, 0, sample, epoch]))
+
+
+class BatchAugmenter:
+    """Random flip, rotation, shift and zoom applied to a whole batch at once.
+
+    The parameters follow ``ImageDataGenerator``: rotation in degrees, shifts
+    as a fraction of the image size and zoom factors drawn from
+    ``[1 - zoom_range, 1 + zoom_range]`` for each axis. Every sample gets one
+    combined 3x3 matrix mapping output to input pixel coordinates, and the
+    batch is warped with one bilinear ``cv2.warpAffine`` per image (NumPy) or
+    a single ``ImageProjectiveTransformV3`` call (TensorFlow), with edge
+    pixels repeated like the ``'nearest'`` fill mode.
+
+    Given the ``samples`` (ids unique within an epoch) and ``epoch`` of a
+    batch, the transform of every sample comes from ``sample_generator`` and
+    is the same for any number of loader workers or batch composition;
+    without them a generator seeded once per augmenter is used.
+    """
+
+    def __init__(self, horizontal_flip=True, rotation_range=20, width_shift_range=0.2,
+                 height_shift_range=0.2, zoom_range=0.2, seed=None):
+        self.horizontal_flip = horizontal_flip
+        self.rotation_range = rotation_range
+        self.width_shift_range = width_shift_range
+        self.height_shift_range = height_shift_range
+        self.zoom_range = zoom_range
+        self.seed = np.random.SeedSequence(seed).entropy
+        self._rng = np.random.default_rng(self.seed)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(horizontal_flip=config.horizontal_flip,
+                   rotation_range=config.rotation_range,
+                   width_shift_range=config.width_shift_range,
+                   height_shift_range=config.height_shift_range,
+                   zoom_range=config.zoom_range,
+                   seed=config.random_state)
+
+    def uniforms(self, n, samples=None, epoch=0):
+        if samples is None:
+            return self._rng.random((n, 6))
+        epochs = np.broadcast_to(epoch, len(samples))
+        return np.array([sample_generator(self.seed, int(e), int(sample)).random(6)
+                         for sample, e in zip(samples, epochs)]).reshape(-1, 6)
+
+    def sample_matrices(self, n, height, width, samples=None, epoch=0):
+        # one row of six uniforms per sample: rotation, shifts, zooms, flip
+        u = 2 * self.uniforms(n, samples, epoch) - 1
+        theta = np.deg2rad(u[:, 0] * self.rotation_range)
+        tx = u[:, 1] * self.width_shift_range * width
+        ty = u[:, 2] * self.height_shift_range * height
+        zx = 1 + u[:, 3] * self.zoom_range
+        zy = 1 + u[:, 4] * self.zoom_range
+        flip = np.where(u[:, 5] < 0, -1.0,
+                        1.0) if self.horizontal_flip else np.ones(n)
+
+        # input = center + R(theta) @ Z(zx, zy) @ F(flip) @ (output - center) + shift
+        cos, sin = np.cos(theta), np.sin(theta)
+        cx, cy = (width - 1) / 2, (height - 1) / 2
+        matrices = np.zeros((n, 3, 3))
+        matrices[:, 0, 0] = cos * zx * flip
+        matrices[:, 0, 1] = -sin * zy
+        matrices[:, 1, 0] = sin * zx * flip
+        matrices[:, 1, 1] = cos * zy
+        matrices[:, 0, 2] = cx + tx - matrices[:, 0, 0] * cx - matrices[:, 0, 1] * cy
+        matrices[:, 1, 2] = cy + ty - matrices[:, 1, 0] * cx - matrices[:, 1, 1] * cy
+        matrices[:, 2, 2] = 1
+        return matrices
+
+    @staticmethod
+    def warp(batch, matrices):
+        out = np.empty_like(batch)
+        size = (batch.shape[2], batch.shape[1])
+        for image, matrix, warped in zip(batch, matrices, out):
+            # the matrices map output to input pixels, as WARP_INVERSE_MAP expects
+            cv2.warpAffine(image, matrix[:2], size, dst=warped,
+                           flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                           borderMode=cv2.BORDER_REPLICATE)
+        return out
+
+    def __call__(self, batch, samples=None, epoch=0):
+        n, height, width = batch.shape[:3]
+        return self.warp(batch, self.sample_matrices(n, height, width, samples, epoch))
+
+    def _flat_transforms(self, n, height, width, keys=None):
+        samples, epochs = (None, 0) if keys is None else (keys[:, 0], keys[:, 1])
+        matrices = self.sample_matrices(int(n), int(height), int(width), samples, epochs)
+        return matrices.reshape(-1, 9)[:, :8].astype(np.float32)
+
+    def tf_apply(self, images, keys=None):
+        """warp a batch in-graph; ``keys`` holds a (sample, epoch) row per image"""
+        shape = tf.shape(images)
+        inputs = [shape[0], shape[1], shape[2]]
+        if keys is not None:
+            inputs.append(keys)
+        transforms = tf.numpy_function(self._flat_transforms, inputs, tf.float32)
+        transforms.set_shape([None, 8])
+        return tf.raw_ops.ImageProjectiveTransformV3(
+            images=images, transforms=transforms, output_shape=shape[1:3],
+            fill_value=0.0, interpolation='BILINEAR', fill_mode='NEAREST')
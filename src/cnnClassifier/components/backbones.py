@@ -0,0 +1,44 @@
+from keras import applications
+from keras.layers import Input, Layer
+from keras.saving import register_keras_serializable
+
+
+@register_keras_serializable(package='cnnClassifier')
+class CaffePreprocessing(Layer):
+    """RGB 0-255 to the mean-centered BGR input of the Caffe-trained backbones"""
+
+    def call(self, inputs):
+        return applications.resnet50.preprocess_input(inputs)
+
+
+# backbone constructor and the preprocessing layer it needs in front of it;
+# the others rescale 0-255 RGB inputs themselves
+BACKBONES = {
+    'EfficientNetB0': (applications.EfficientNetB0, None),
+    'EfficientNetB1': (applications.EfficientNetB1, None),
+    'EfficientNetB2': (applications.EfficientNetB2, None),
+    'EfficientNetB3': (applications.EfficientNetB3, None),
+    'EfficientNetB4': (applications.EfficientNetB4, None),
+    'EfficientNetB5': (applications.EfficientNetB5, None),
+    'EfficientNetB6': (applications.EfficientNetB6, None),
+    'EfficientNetB7': (applications.EfficientNetB7, None),
+    'MobileNetV3Small': (applications.MobileNetV3Small, None),
+    'MobileNetV3Large': (applications.MobileNetV3Large, None),
+    'ResNet50': (applications.ResNet50, CaffePreprocessing),
+    'ConvNeXtTiny': (applications.ConvNeXtTiny, None),
+}
+
+CUSTOM_OBJECTS = {'CaffePreprocessing': CaffePreprocessing}
+
+
+def build_backbone(name, include_top=False, weights='imagenet', input_shape=(224, 224, 3),
+                   pooling='max'):
+    """backbone ``name`` taking RGB images with values in [0, 255]"""
+    if name not in BACKBONES:
+        raise ValueError(f"Unknown backbone {name!r}, expected one of {sorted(BACKBONES)}")
+    application, preprocessing = BACKBONES[name]
+    input_tensor = None
+    if preprocessing is not None:
+        input_tensor = preprocessing()(Input(shape=input_shape))
+    return application(include_top=include_top, weights=weights, input_shape=input_shape,
+                       input_tensor=input_tensor, pooling=pooling)
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class ClassBalancedBatchSampler:
+    """Per-epoch index arrays that draw every class by weight.
+
+    ``classes`` holds the class code of every row. Each epoch, class ``c``
+    contributes ``round(weight_c * samples_per_class * n_classes)`` rows: its
+    rows in a fresh random order, cycled when the class is smaller than its
+    share. The draws of all classes are spread evenly over the epoch, so every
+    batch comes close to the target class mix. Classes with fewer than
+    ``min_samples`` rows get weight 0. Only index arrays are produced; the
+    dataframe is never copied.
+    """
+
+    def __init__(self, classes, samples_per_class=None, class_weights=None, min_samples=0,
+                 seed=None):
+        self.classes = np.asarray(classes)
+        self.counts = np.bincount(self.classes)
+        self.starts = np.cumsum(self.counts) - self.counts
+        weights = np.ones(len(self.counts)) if class_weights is None else \
+            np.asarray(class_weights, dtype=np.float64)
+        weights = np.where(self.counts >= max(min_samples or 0, 1), weights, 0)
+        self.weights = weights / weights.sum()
+        samples_per_class = samples_per_class or self.counts.max()
+        self.quota = np.round(self.weights * samples_per_class *
+                              np.count_nonzero(self.weights)).astype(np.int64)
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return int(self.quota.sum())
+
+    def epoch_indices(self):
+        rng = self._rng
+        # rows grouped by class, in random order within each class
+        shuffled = rng.permutation(len(self.classes))
+        grouped = shuffled[np.argsort(self.classes[shuffled], kind='stable')]
+
+        klass = np.repeat(np.arange(len(self.quota)), self.quota)
+        draw = np.arange(len(klass)) - np.repeat(np.cumsum(self.quota) - self.quota, self.quota)
+        rows = grouped[self.starts[klass] + draw % self.counts[klass]]
+        # the j-th draw of a class lands near position j / quota of the epoch
+        position = (draw + rng.random(len(klass))) / self.quota[klass]
+        return rows[np.argsort(position, kind='stable')]
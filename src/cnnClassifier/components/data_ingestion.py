@@ -1,92 +1,255 @@
+import math
 import os
+import posixpath
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dataclasses import dataclass
 import yaml
 import zipfile
 from sklearn.model_selection import train_test_split
 import shutil
-from keras.preprocessing.image import ImageDataGenerator
 from cnnClassifier.constants import CONFIG_FILE_PATH, PARAMS_FILE_PATH
-from cnnClassifier.utils.common import read_yaml, create_directories, get_size
+from cnnClassifier.utils.common import read_yaml, create_directories, get_size, save_json
 from cnnClassifier.entity.config_entity import DataIngestionConfig
+from cnnClassifier.components.zip_dataset import ZipImageSource, member_label
+from cnnClassifier.components.image_sequence import DataFrameImageSequence, PaddedBatchSequence
+from cnnClassifier.components.tf_data_pipeline import TFDataGenerator
+from cnnClassifier.components.augmentation import BatchAugmenter
+from cnnClassifier.components.balanced_sampler import ClassBalancedBatchSampler
+from cnnClassifier.components.image_cache import ImageTensorCache, CachedImageSequence, read_file, file_key
+from cnnClassifier.components.shared_memory_loader import SharedMemoryBatchLoader
+from cnnClassifier.components.record_shards import ShardWriter, ShardedRecordGenerator
+from cnnClassifier.utils.file_index import scan_image_files, FileIndex
+from cnnClassifier.utils.image_header import read_image_sizes, SIZE_COLUMNS
+from cnnClassifier.utils.manifest import (
+    read_source_manifest, normalize_path, save_split_manifest, load_split_manifest,
+    split_manifest_path)
 from cnnClassifier import logger
 
 
 class DataIngestion:
     def __init__(self, config: DataIngestionConfig):
         self.config = config
+        self.zip_source = None
+        if self.config.read_from_zip:
+            self.zip_source = ZipImageSource(self.config.local_data_file)
+
+    def load_manifest(self):
+        source_csv = normalize_path(self.config.source_csv)
+        logger.info("Loading image file paths and labels from %s.", source_csv)
+        image_dir = self.config.manifest_image_dir or ''
+        if self.zip_source is not None:
+            path_prefix = image_dir
+            if not os.path.exists(source_csv):
+                member = next((name for name in self.zip_source.names(('.csv',))
+                               if posixpath.basename(name) == posixpath.basename(source_csv)), None)
+                if member is None:
+                    raise FileNotFoundError(
+                        f"{source_csv} not found on disk or in {self.config.local_data_file}")
+                source_csv = pa.BufferReader(
+                    bytes(self.zip_source.read(member)))
+        else:
+            path_prefix = os.path.join(self.config.root_dir, image_dir)
+        return read_source_manifest(source_csv, path_prefix=path_prefix,
+                                    path_column=self.config.manifest_path_column,
+                                    label_column=self.config.manifest_label_column)
 
     def load_images(self):
+        if self.config.ingestion_mode == 'manifest':
+            return self.load_manifest()
         logger.info("Loading image file paths and labels.")
-        filepaths = []
-        labels = []
-        for dirpath, dirnames, filenames in os.walk(self.config.root_dir):
-            for filename in filenames:
-                filepaths.append(os.path.join(dirpath, filename))
-                labels.append(os.path.basename(dirpath))
-        df = pd.DataFrame({'filepaths': filepaths, 'labels': labels})
+        if self.zip_source is not None:
+            filepaths = self.zip_source.names()
+            df = pd.DataFrame({'filepaths': filepaths,
+                               'labels': pd.Categorical([member_label(name) for name in filepaths])})
+            logger.info(
+                f"Image members and labels loaded from {self.config.local_data_file} with {df.shape[0]} rows.")
+            return df
+        if self.config.file_index_path:
+            df = FileIndex(self.config.file_index_path, self.config.root_dir,
+                           max_workers=self.config.scan_workers).scan()
+        else:
+            df = scan_image_files(self.config.root_dir,
+                                  max_workers=self.config.scan_workers)
         logger.info(
             f"Image file paths and labels loaded successfully with {df.shape[0]} rows.")
         return df
 
+    def needs_image_sizes(self):
+        # only the tf.data pipeline groups images by source size
+        return self.config.loader_backend == 'tf_data' and bool(self.config.size_buckets)
+
+    def record_image_sizes(self, df):
+        if not self.needs_image_sizes():
+            return df
+        logger.info("Reading image sizes from the file headers.")
+        filepaths = df['filepaths'].astype(str).to_numpy()
+        stat = self.zip_source.stat if self.zip_source is not None else file_key
+        with ThreadPoolExecutor(max_workers=self.config.scan_workers) as executor:
+            keys = np.array(list(executor.map(stat, filepaths)),
+                            dtype=np.int64).reshape(-1, 2)
+        index = pd.DataFrame({'filepaths': filepaths, 'size': keys[:, 0], 'version': keys[:, 1]})
+
+        # sizes of files whose (size, version) key is unchanged come from the last run
+        cache_path = os.path.join(self.config.working_dir, 'image_sizes.parquet')
+        sizes = np.full((len(index), 2), -1, dtype=np.int32)
+        known = np.zeros(len(index), dtype=bool)
+        if os.path.exists(cache_path):
+            cached = pd.read_parquet(cache_path)
+            cached = cached.drop_duplicates(['filepaths', 'size', 'version'])
+            key = ['filepaths', 'size', 'version']
+            found = index[key].merge(cached, on=key, how='left')
+            known = found['image_height'].notna().to_numpy()
+            sizes[known] = found.loc[known, SIZE_COLUMNS].to_numpy(dtype=np.int32)
+        read_prefix = self.zip_source.read_prefix if self.zip_source is not None else None
+        sizes[~known] = read_image_sizes(filepaths[~known], read_prefix,
+                                         max_workers=self.config.scan_workers)
+        logger.info("%s image sizes cached, %s read from headers.",
+                    int(known.sum()), int((~known).sum()))
+
+        index[SIZE_COLUMNS[0]], index[SIZE_COLUMNS[1]] = sizes[:, 0], sizes[:, 1]
+        os.makedirs(self.config.working_dir, exist_ok=True)
+        index.to_parquet(cache_path, index=False)
+
+        df = df.assign(image_height=sizes[:, 0], image_width=sizes[:, 1])
+        distinct = pd.Series(list(map(tuple, sizes))).value_counts()
+        logger.info("%s distinct image sizes, most common: %s", len(distinct),
+                    ', '.join(f"{w}x{h} ({count})" for (h, w), count in distinct.head(5).items()))
+        return df
+
+    def split_keys(self, df):
+        keys = df['filepaths'].astype(str).str.replace('\\', '/', regex=False)
+        root = normalize_path(self.config.root_dir) + '/'
+        if len(keys) and keys.str.startswith(root).all():
+            keys = keys.str.slice(len(root))
+        return keys
+
     def split_data(self, df):
         logger.info(
             "Splitting data into training, testing, and validation sets.")
-        trsplit = self.config.train_size
-        vsplit = self.config.validation_size
-        dsplit = vsplit / (1 - trsplit)
-        strat = df['labels']
-        train_df, dummy_df = train_test_split(
-            df, train_size=trsplit, shuffle=True, random_state=self.config.random_state, stratify=strat)
-        strat = dummy_df['labels']
-        test_df, valid_df = train_test_split(
-            dummy_df, train_size=dsplit, shuffle=True, random_state=self.config.random_state, stratify=strat)
+        hash_key = None
+        if self.config.random_state is not None:
+            hash_key = f"{self.config.random_state:016d}"[-16:]
+        hashes = pd.util.hash_pandas_object(
+            self.split_keys(df), index=False, hash_key=hash_key).to_numpy()
+        fractions = [self.config.train_size, self.config.validation_size, self.config.test_size]
+        if not math.isclose(sum(fractions), 1.0, abs_tol=1e-6):
+            raise ValueError(f"train_size, validation_size and test_size add up to {sum(fractions)}, not 1")
+        codes, classes = pd.factorize(df['labels'], sort=True)
+
+        # a fixed cut of each file's hash, so existing files keep their split
+        # as the dataset grows; 0 = train, 1 = valid, 2 = test
+        uniform = (hashes >> np.uint64(11)).astype(np.float64) / 2.0**53
+        split = np.searchsorted(np.cumsum(fractions[:2]), uniform, side='right')
+
+        # classes too small to expect one valid and one test image get one of
+        # each by hash rank; only these move when such a class grows
+        counts = np.bincount(codes, minlength=len(classes))
+        tiny = (counts >= 3) & (counts * min(fractions[1:]) < 1)
+        for code in np.flatnonzero(tiny):
+            rows = np.flatnonzero(codes == code)
+            ranked = rows[np.argsort(uniform[rows])]
+            split[ranked] = 0
+            split[ranked[-2]], split[ranked[-1]] = 1, 2
+        train_df = df[split == 0]
+        valid_df = df[split == 1]
+        test_df = df[split == 2]
+
+        per_class = np.bincount(codes * 3 + split, minlength=3 * len(classes)
+                                ).reshape(len(classes), 3)
         logger.info("Data split successfully.")
         logger.info(f"Train set size: {train_df.shape[0]}")
         logger.info(f"Test set size: {test_df.shape[0]}")
         logger.info(f"Validation set size: {valid_df.shape[0]}")
+        for klass, (n_train, n_valid, n_test) in zip(classes, per_class):
+            logger.info(
+                f"{klass}: train {n_train}, valid {n_valid}, test {n_test}")
 
         return train_df, test_df, valid_df
 
-    def class_distribution(self, train_df):
+    def class_distribution(self, train_df, valid_df, test_df):
         logger.info("Getting class distribution.")
-        groups = train_df.groupby('labels')
-        print('{0:^30s} {1:^13s}'.format('CLASS', 'IMAGE COUNT'))
-        for label in train_df['labels'].unique():
-            print('{0:^30s} {1:^13d}'.format(
-                label, len(groups.get_group(label))))
-        print('\n')
+        splits = {'train': train_df, 'valid': valid_df, 'test': test_df}
+        classes = sorted(set().union(
+            *(df['labels'].unique() for df in splits.values())))
+        counts = {name: np.bincount(pd.Categorical(df['labels'], categories=classes).codes,
+                                    minlength=len(classes))
+                  for name, df in splits.items()}
+        distribution = {
+            'classes': {label: {name: int(counts[name][i]) for name in splits}
+                        for i, label in enumerate(classes)},
+            'totals': {name: len(df) for name, df in splits.items()}
+        }
+        save_json(Path(os.path.join(self.config.working_dir,
+                  'class_distribution.json')), distribution)
+
+        logger.info('{0:^30s} {1:^8s} {2:^8s} {3:^8s}'.format(
+            'CLASS', 'TRAIN', 'VALID', 'TEST'))
+        for label, row in distribution['classes'].items():
+            logger.info('{0:^30s} {1:^8d} {2:^8d} {3:^8d}'.format(
+                label, row['train'], row['valid'], row['test']))
+        return distribution
 
     def trim(self, train_df):
         logger.info("Trimming classes.")
         max_size = self.config.max_samples
         min_size = self.config.min_samples
-        column = 'labels'
-        train_df = train_df.copy()
-        original_class_count = len(list(train_df[column].unique()))
+        floor = min(self.config.oversample_floor or 0, max_size)
+        codes, classes = pd.factorize(train_df['labels'], sort=True)
+        counts = np.bincount(codes, minlength=len(classes))
         logger.info('Original Number of classes in dataframe: %s',
-                    original_class_count)
-        sample_list = []
-        groups = train_df.groupby(column)
-        for label in train_df[column].unique():
-            group = groups.get_group(label)
-            sample_count = len(group)
-            if sample_count > max_size:
-                strat = group[column]
-                samples, _ = train_test_split(
-                    group, train_size=max_size, shuffle=True, random_state=self.config.random_state, stratify=strat)
-                sample_list.append(samples)
-            elif sample_count >= min_size:
-                sample_list.append(group)
-        train_df = pd.concat(sample_list, axis=0).reset_index(drop=True)
-        final_class_count = len(list(train_df[column].unique()))
-        if final_class_count != original_class_count:
+                    len(classes))
+
+        # rows grouped by class, in random order within each class
+        rng = np.random.default_rng(self.config.random_state)
+        shuffled = rng.permutation(len(codes))
+        order = shuffled[np.argsort(codes[shuffled].astype(
+            np.min_scalar_type(len(classes))), kind='stable')]
+        starts = np.cumsum(counts) - counts
+        rank = np.empty(len(codes), dtype=np.int64)
+        rank[order] = np.arange(len(codes)) - np.repeat(starts, counts)
+
+        kept_classes = counts >= min_size
+        index = np.flatnonzero(kept_classes[codes] & (rank < max_size))
+        deficit = np.where(kept_classes, np.maximum(
+            floor - np.minimum(counts, max_size), 0), 0)
+        if deficit.any():
+            extra_class = np.repeat(np.arange(len(classes)), deficit)
+            offsets = rng.integers(0, counts[extra_class])
+            index = np.concatenate([index, order[starts[extra_class] + offsets]])
+            logger.info('Oversampled %s rows up to %s per class',
+                        deficit.sum(), floor)
+
+        if not kept_classes.all():
             logger.warning(
                 '*** WARNING***  dataframe has a reduced number of classes')
-        balance = list(train_df[column].value_counts())
-        logger.info('Class balance: %s', balance)
-        return train_df
+        balance = np.bincount(codes[index], minlength=len(classes))[
+            kept_classes]
+        logger.info('Class balance: %s', balance.tolist())
+        return index
+
+    def use_sampler(self):
+        if self.config.rebalance != 'sampler':
+            return False
+        if self.config.loader_backend == 'tfrecord':
+            logger.warning("The %s loader cannot draw from a sampler, trimming instead.",
+                           self.config.loader_backend)
+            return False
+        return True
+
+    def make_sampler(self, train_df):
+        if not self.use_sampler():
+            return None
+        codes = pd.factorize(train_df['labels'], sort=True)[0]
+        sampler = ClassBalancedBatchSampler(codes, samples_per_class=self.config.max_samples,
+                                            min_samples=self.config.min_samples,
+                                            seed=self.config.random_state)
+        logger.info('Class-balanced sampler draws %s rows per epoch from %s.',
+                    len(sampler), len(codes))
+        return sampler
 
     def prepare_working_dir(self):
         logger.info("Preparing working directory.")
@@ -94,39 +257,162 @@ class DataIngestion:
         logger.info("Working directory prepared.")
 
     def save_data(self, df, path):
-        logger.info("Saving dataframe to %s.", path)
-        df.to_csv(path, index=False)
-        logger.info("Dataframe saved.")
+        path = save_split_manifest(df, path, self.config.split_format)
+        logger.info("Dataframe saved to %s.", path)
+
+    def load_data(self, split):
+        path = os.path.join(self.config.working_dir, split)
+        logger.info("Loading %s split from %s.", split,
+                    split_manifest_path(path, self.config.split_format))
+        return load_split_manifest(path, self.config.split_format)
+
+    def test_batching(self, length):
+        # fixed batch size, the last batch is padded and masked by sample weights
+        test_batch_size = self.config.eval_batch_size
+        test_steps = math.ceil(length / test_batch_size)
+        return test_batch_size, test_steps
 
     def create_generators(self, train_df, valid_df, test_df, img_size=(224, 224), batch_size=20):
         logger.info("Creating data generators.")
 
-        trgen = ImageDataGenerator(horizontal_flip=True, rotation_range=20, width_shift_range=.2,
-                                   height_shift_range=.2, zoom_range=.2)
-        t_and_v_gen = ImageDataGenerator()
+        if self.config.loader_backend == 'tf_data':
+            return self.create_tf_data_generators(train_df, valid_df, test_df, img_size, batch_size)
+        if self.config.loader_backend == 'tfrecord':
+            return self.create_shard_generators(train_df, valid_df, test_df, img_size, batch_size)
+
+        if self.config.loader_backend == 'cache':
+            return self.create_cache_generators(train_df, valid_df, test_df, img_size, batch_size)
+        if self.config.loader_backend == 'shared_memory':
+            return self.create_shared_memory_generators(train_df, valid_df, test_df, img_size, batch_size)
+        return self.create_keras_generators(train_df, valid_df, test_df, img_size, batch_size)
+
+    def create_keras_generators(self, train_df, valid_df, test_df, img_size, batch_size):
+        if self.zip_source is not None:
+            logger.info("Reading images directly from %s.",
+                        self.config.local_data_file)
+        read_bytes = self.zip_source.read if self.zip_source is not None else read_file
+        train_gen, valid_gen, test_gen, test_batch_size, test_steps = self.create_sequence_generators(
+            train_df, valid_df, test_df, img_size, batch_size, read_bytes)
+        return train_gen, valid_gen, PaddedBatchSequence(test_gen), test_batch_size, test_steps
+
+    def create_sequence_generators(self, train_df, valid_df, test_df, img_size, batch_size, read_bytes):
+        train_gen = DataFrameImageSequence(train_df, read_bytes, img_size=img_size, batch_size=batch_size,
+                                           shuffle=True, augmenter=BatchAugmenter.from_config(self.config),
+                                           seed=self.config.random_state, sampler=self.make_sampler(train_df),
+                                           resize_mode=self.config.resize_mode)
+        class_indices = train_gen.class_indices
+        valid_gen = DataFrameImageSequence(valid_df, read_bytes, img_size=img_size, batch_size=batch_size,
+                                           class_indices=class_indices, resize_mode=self.config.resize_mode)
+
+        test_batch_size, test_steps = self.test_batching(len(test_df))
+        test_gen = DataFrameImageSequence(test_df, read_bytes, img_size=img_size, batch_size=test_batch_size,
+                                          class_indices=class_indices, resize_mode=self.config.resize_mode)
+
+        logger.info("Data generators created successfully.")
+        return train_gen, valid_gen, test_gen, test_batch_size, test_steps
+
+    def create_embedding_sequences(self, dfs, img_size, batch_size):
+        """unshuffled, unaugmented sequences over ``dfs`` with the classes of the first"""
+        read_bytes = self.zip_source.read if self.zip_source is not None else read_file
+        sequences = []
+        class_indices = None
+        for df in dfs:
+            sequences.append(DataFrameImageSequence(df, read_bytes, img_size=img_size, batch_size=batch_size,
+                                                    class_indices=class_indices,
+                                                    resize_mode=self.config.resize_mode))
+            class_indices = sequences[0].class_indices
+        return sequences
+
+    def create_shared_memory_generators(self, train_df, valid_df, test_df, img_size, batch_size):
+        logger.info("Loading batches with %s worker processes per split.",
+                    self.config.loader_workers)
+        read_bytes = self.zip_source.read if self.zip_source is not None else read_file
+        *sequences, test_batch_size, test_steps = self.create_sequence_generators(
+            train_df, valid_df, test_df, img_size, batch_size, read_bytes)
+        train_gen, valid_gen, test_gen = [
+            SharedMemoryBatchLoader(sequence, num_workers=self.config.loader_workers,
+                                    queue_depth=self.config.loader_queue_depth)
+            for sequence in sequences]
+        return train_gen, valid_gen, PaddedBatchSequence(test_gen), test_batch_size, test_steps
+
+    def create_cache_generators(self, train_df, valid_df, test_df, img_size, batch_size):
+        logger.info("Decoding splits into the image cache at %s.",
+                    self.config.image_cache_dir)
+        if self.zip_source is not None:
+            cache = ImageTensorCache(self.config.image_cache_dir, img_size,
+                                     read_bytes=self.zip_source.read, stat=self.zip_source.stat,
+                                     resize_mode=self.config.resize_mode)
+        else:
+            cache = ImageTensorCache(self.config.image_cache_dir, img_size,
+                                     resize_mode=self.config.resize_mode)
+        class_indices = {label: index for index, label in
+                         enumerate(sorted(train_df['labels'].unique()))}
+        train_gen = CachedImageSequence(*cache.build('train', train_df, class_indices), batch_size=batch_size,
+                                        shuffle=True, augmenter=BatchAugmenter.from_config(self.config),
+                                        seed=self.config.random_state, sampler=self.make_sampler(train_df))
+        valid_gen = CachedImageSequence(*cache.build('valid', valid_df, class_indices), batch_size=batch_size)
+
+        test_batch_size, test_steps = self.test_batching(len(test_df))
+        test_gen = PaddedBatchSequence(CachedImageSequence(*cache.build('test', test_df, class_indices),
+                                                           batch_size=test_batch_size))
+
+        logger.info("Data generators created successfully.")
+        return train_gen, valid_gen, test_gen, test_batch_size, test_steps
+
+    def create_tf_data_generators(self, train_df, valid_df, test_df, img_size, batch_size):
+        logger.info("Building tf.data input pipelines.")
+        read_bytes = self.zip_source.read if self.zip_source is not None else None
+        augmenter = BatchAugmenter.from_config(self.config)
+        options = dict(img_size=img_size, read_bytes=read_bytes,
+                       resize_mode=self.config.resize_mode)
+        train_gen = TFDataGenerator(train_df, batch_size=batch_size, shuffle=True, augmenter=augmenter,
+                                    seed=self.config.random_state, sampler=self.make_sampler(train_df),
+                                    size_buckets=self.config.size_buckets, **options)
+        class_indices = train_gen.class_indices
+        valid_gen = TFDataGenerator(valid_df, batch_size=batch_size,
+                                    class_indices=class_indices, **options)
+
+        test_batch_size, test_steps = self.test_batching(len(test_df))
+        test_gen = TFDataGenerator(test_df, batch_size=test_batch_size,
+                                   class_indices=class_indices, pad_to_batch=True, **options)
+
+        logger.info("Data generators created successfully.")
+        return train_gen, valid_gen, test_gen, test_batch_size, test_steps
 
-        train_gen = trgen.flow_from_dataframe(train_df, x_col='filepaths', y_col='labels', target_size=img_size,
-                                              class_mode='categorical', color_mode='rgb', shuffle=True, batch_size=batch_size)
-        valid_gen = t_and_v_gen.flow_from_dataframe(valid_df, x_col='filepaths', y_col='labels', target_size=img_size,
-                                                    class_mode='categorical', color_mode='rgb', shuffle=False, batch_size=batch_size)
+    def create_shard_generators(self, train_df, valid_df, test_df, img_size, batch_size):
+        logger.info("Packing splits into TFRecord shards at %s.",
+                    self.config.shard_dir)
+        writer = ShardWriter(self.config.shard_dir, shard_size=self.config.shard_size,
+                             num_workers=self.config.shard_workers,
+                             zip_path=self.config.local_data_file if self.zip_source is not None else None,
+                             stat=self.zip_source.stat if self.zip_source is not None else file_key)
+        class_indices = {label: index for index, label in
+                         enumerate(sorted(train_df['labels'].unique()))}
+        options = dict(img_size=img_size, class_indices=class_indices,
+                       resize_mode=self.config.resize_mode,
+                       cycle_length=self.config.shard_cycle_length,
+                       shuffle_buffer=self.config.shuffle_buffer)
+        train_gen = ShardedRecordGenerator(train_df, writer.write('train', train_df, class_indices),
+                                           batch_size=batch_size, shuffle=True, augmenter=BatchAugmenter.from_config(self.config),
+                                           seed=self.config.random_state, **options)
+        valid_gen = ShardedRecordGenerator(valid_df, writer.write('valid', valid_df, class_indices),
+                                           batch_size=batch_size, **options)
 
-        length = len(test_df)
-        test_batch_size = sorted([int(length/n) for n in range(1, length+1)
-                                 if length % n == 0 and length/n <= 80], reverse=True)[0]
-        test_steps = int(length/test_batch_size)
-        test_gen = t_and_v_gen.flow_from_dataframe(test_df, x_col='filepaths', y_col='labels', target_size=img_size,
-                                                   class_mode='categorical', color_mode='rgb', shuffle=False, batch_size=test_batch_size)
+        test_batch_size, test_steps = self.test_batching(len(test_df))
+        test_gen = ShardedRecordGenerator(test_df, writer.write('test', test_df, class_indices),
+                                          batch_size=test_batch_size, pad_to_batch=True, **options)
 
         logger.info("Data generators created successfully.")
         return train_gen, valid_gen, test_gen, test_batch_size, test_steps
 
     def execute(self):
         logger.info("Starting data ingestion.")
-        df = self.load_images()
+        df = self.record_image_sizes(self.load_images())
         train_df, test_df, valid_df = self.split_data(df)
-        self.class_distribution(train_df)
-        train_df = self.trim(train_df)
+        if not self.use_sampler():
+            train_df = train_df.iloc[self.trim(train_df)].reset_index(drop=True)
         self.prepare_working_dir()
+        self.class_distribution(train_df, valid_df, test_df)
 
         # save the dataframes to corresponding directories
         self.save_data(train_df, os.path.join(
@@ -136,7 +422,7 @@ class DataIngestion:
             self.config.working_dir, 'valid'))
 
         train_gen, valid_gen, test_gen, test_batch_size, test_steps = self.create_generators(
-            train_df, test_df, valid_df)
+            train_df, valid_df, test_df, img_size=tuple(self.config.img_size), batch_size=self.config.batch_size)
 
         classes = list(train_gen.class_indices.keys())
         class_indices = list(train_gen.class_indices.values())
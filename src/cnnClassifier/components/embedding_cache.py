@@ -0,0 +1,67 @@
+import os
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from cnnClassifier import logger
+
+
+class EmbeddingCache:
+    """Pooled features of a frozen backbone for each split, one float16 N x D array.
+
+    ``<split>.npy`` holds a feature row per image and ``<split>.index.parquet``
+    its filepath, class code and the key of the backbone that produced it.
+    A split is recomputed only when its files, classes or the backbone key
+    change, so the head can be trained for any number of runs on a single
+    backbone pass.
+    """
+
+    def __init__(self, cache_dir, backbone, key):
+        if len(backbone.output_shape) != 2:
+            raise ValueError(f"Backbone output {backbone.output_shape} is not pooled; "
+                             "set params.base_model.pooling to 'max' or 'avg'")
+        self.cache_dir = Path(cache_dir)
+        self.backbone = backbone
+        self.key = str(key)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def paths(self, name):
+        return self.cache_dir / f"{name}.npy", self.cache_dir / f"{name}.index.parquet"
+
+    def is_current(self, name, index):
+        array_path, index_path = self.paths(name)
+        if not (array_path.exists() and index_path.exists()):
+            return False
+        return pd.read_parquet(index_path).equals(index)
+
+    def build(self, name, sequence):
+        """features of every sample of an unaugmented ``sequence``"""
+        index = pd.DataFrame({'filepaths': sequence.filenames.astype(str),
+                              'classes': sequence.classes})
+        index['key'] = self.key
+        if self.is_current(name, index):
+            logger.info(f"Embedding cache for {name} is up to date.")
+            return self.load(name)
+
+        array_path, index_path = self.paths(name)
+        tmp_path = array_path.with_suffix('.tmp.npy')
+        features = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float16,
+                                             shape=(len(index), self.backbone.output_shape[-1]))
+        start = time.perf_counter()
+        for batch in range(len(sequence)):
+            batch_index = sequence.index_array[batch * sequence.batch_size:
+                                               (batch + 1) * sequence.batch_size]
+            features[batch_index] = self.backbone.predict_on_batch(
+                sequence.load_batch(batch_index))
+        features.flush()
+        del features
+        os.replace(tmp_path, array_path)
+        index.to_parquet(index_path, index=False)
+        seconds = time.perf_counter() - start
+        logger.info(f"Embedding cache for {name}: {len(index)} images in {seconds:.1f}s "
+                    f"({len(index) / max(seconds, 1e-9):.1f} images/s).")
+        return self.load(name)
+
+    def load(self, name):
+        array_path, index_path = self.paths(name)
+        return np.load(array_path, mmap_mode='r'), pd.read_parquet(index_path)
@@ -0,0 +1,145 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from cnnClassifier.components.image_sequence import DataFrameImageSequence, decode_image, label_codes
+from cnnClassifier import logger
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def file_key(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ImageTensorCache:
+    """Decoded images of each split stored as one uint8 N x H x W x 3 array.
+
+    ``<split>.npy`` holds the pixels and ``<split>.index.parquet`` maps every
+    row to its filepath, label code and the (size, version) key of the source
+    file, with the ``class_indices`` of the codes in the parquet metadata.
+    Rebuilding a split copies the rows whose key, image size and resize mode
+    are unchanged from the previous array and only decodes the others.
+    """
+
+    def __init__(self, cache_dir, img_size=(224, 224), read_bytes=read_file, stat=file_key,
+                 max_workers=8, copy_chunk=1024, resize_mode='stretch'):
+        self.cache_dir = Path(cache_dir)
+        self.img_size = tuple(img_size)
+        self.resize_mode = resize_mode
+        self.read_bytes = read_bytes
+        self.stat = stat
+        self.max_workers = max_workers
+        self.copy_chunk = copy_chunk
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def paths(self, name):
+        return self.cache_dir / f"{name}.npy", self.cache_dir / f"{name}.index.parquet"
+
+    def _previous_rows(self, name, index):
+        array_path, index_path = self.paths(name)
+        rows = np.full(len(index), -1, dtype=np.int64)
+        if not (array_path.exists() and index_path.exists()):
+            return rows, None
+        previous = pd.read_parquet(index_path)
+        if not len(previous) or 'resize_mode' not in previous or \
+                tuple(previous.loc[0, ['height', 'width', 'resize_mode']]) != (*self.img_size, self.resize_mode):
+            return rows, None
+        key = ['filepaths', 'size', 'version']
+        lookup = pd.Series(np.arange(len(previous)),
+                           index=pd.MultiIndex.from_frame(previous[key].astype({'filepaths': str})))
+        lookup = lookup[~lookup.index.duplicated()]
+        rows = lookup.reindex(pd.MultiIndex.from_frame(index[key])
+                              ).fillna(-1).to_numpy(dtype=np.int64)
+        return rows, np.load(array_path, mmap_mode='r')
+
+    def build(self, name, df, class_indices):
+        filepaths = df['filepaths'].astype(str).to_numpy()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            keys = np.array(list(executor.map(self.stat, filepaths)),
+                            dtype=np.int64).reshape(-1, 2)
+        index = pd.DataFrame({'filepaths': filepaths,
+                              'classes': label_codes(df['labels'], class_indices),
+                              'size': keys[:, 0],
+                              'version': keys[:, 1]})
+        index['height'], index['width'] = self.img_size
+        index['resize_mode'] = self.resize_mode
+
+        rows, previous = self._previous_rows(name, index)
+        if previous is not None and len(previous) == len(index) and \
+                (rows == np.arange(len(index))).all():
+            _, cached, cached_indices = self.load(name)
+            if cached_indices == class_indices and 'classes' in cached and \
+                    np.array_equal(cached['classes'].to_numpy(), index['classes'].to_numpy()):
+                logger.info(f"Image cache for {name} is up to date.")
+            else:
+                # only the label codes changed, the pixels stay
+                self.save_index(name, index, class_indices)
+                logger.info(f"Image cache for {name}: label codes updated.")
+            return self.load(name)
+
+        array_path, index_path = self.paths(name)
+        tmp_path = array_path.with_suffix('.tmp.npy')
+        images = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8,
+                                           shape=(len(index), *self.img_size, 3))
+        reused = np.flatnonzero(rows >= 0)
+        for start in range(0, len(reused), self.copy_chunk):
+            chunk = reused[start:start + self.copy_chunk]
+            images[chunk] = previous[rows[chunk]]
+
+        def decode(row):
+            images[row] = decode_image(self.read_bytes(filepaths[row]), self.img_size,
+                                       filepaths[row], resize_mode=self.resize_mode)
+
+        missing = np.flatnonzero(rows < 0)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(decode, missing))
+        images.flush()
+        del images, previous
+        os.replace(tmp_path, array_path)
+        self.save_index(name, index, class_indices)
+        logger.info(
+            f"Image cache for {name}: {len(reused)} rows reused, {len(missing)} decoded.")
+        return self.load(name)
+
+    def save_index(self, name, index, class_indices):
+        table = pa.Table.from_pandas(index, preserve_index=False)
+        metadata = {**(table.schema.metadata or {}),
+                    b'class_indices': json.dumps(class_indices).encode()}
+        pq.write_table(table.replace_schema_metadata(metadata), self.paths(name)[1])
+
+    def load(self, name):
+        """pixels, index and class_indices of a split"""
+        array_path, index_path = self.paths(name)
+        table = pq.read_table(index_path)
+        class_indices = json.loads((table.schema.metadata or {}).get(b'class_indices', b'null'))
+        return np.load(array_path, mmap_mode='r'), table.to_pandas(), class_indices
+
+
+class CachedImageSequence(DataFrameImageSequence):
+    """DataFrameImageSequence reading batches and label codes from an ImageTensorCache split."""
+
+    def __init__(self, images, index, class_indices, batch_size=20, shuffle=False, augmenter=None,
+                 seed=None, sampler=None):
+        self.images = images
+        super().__init__(index, read_bytes=None, img_size=images.shape[1:3], batch_size=batch_size,
+                         shuffle=shuffle, augmenter=augmenter,
+                         class_indices=class_indices, seed=seed, sampler=sampler)
+
+    def encode_classes(self, df, y_col):
+        return df['classes'].to_numpy(dtype='int32')
+
+    def load_batch(self, batch_index):
+        if len(batch_index) and (np.diff(batch_index) == 1).all():
+            batch = self.images[batch_index[0]:batch_index[-1] + 1]
+        else:
+            batch = self.images[batch_index]
+        return batch.astype('float32')
@@ -0,0 +1,254 @@
+import functools
+import cv2
+import numpy as np
+from keras.utils import Sequence
+from cnnClassifier.utils.image_header import is_jpeg, jpeg_size, reduction_factor, SIZE_COLUMNS
+
+
+RESIZE_MODES = ('stretch', 'pad')
+
+
+_REDUCED_COLOR = {2: cv2.IMREAD_REDUCED_COLOR_2,
+                  4: cv2.IMREAD_REDUCED_COLOR_4,
+                  8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def read_image(data, img_size, name=None, reduced=True, source_size=None):
+    """decode encoded image bytes to a BGR uint8 array
+
+    With ``reduced`` a JPEG is decoded by libjpeg at the smallest power-of-two
+    scale (1/2, 1/4 or 1/8) that is still at least ``img_size``. The source
+    size is read from the JPEG header unless ``source_size`` is given.
+    """
+    flags = cv2.IMREAD_COLOR
+    if reduced and is_jpeg(data):
+        if source_size is None or source_size[0] <= 0:
+            source_size = jpeg_size(data)
+        if source_size is not None:
+            flags = _REDUCED_COLOR.get(
+                reduction_factor(source_size, img_size), flags)
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if image is None:
+        raise ValueError(f"Could not decode image {name}")
+    return image
+
+
+@functools.lru_cache(maxsize=1024)
+def resize_geometry(source_size, img_size, mode='stretch'):
+    """resized (height, width) of an image and its (top, left) offset in ``img_size``
+
+    ``'stretch'`` fills ``img_size`` exactly, ``'pad'`` keeps the aspect ratio
+    and centres the image on a black canvas.
+    """
+    height, width = img_size
+    if mode == 'stretch':
+        return (height, width), (0, 0)
+    if mode != 'pad':
+        raise ValueError(
+            f"Unknown resize mode {mode!r}, expected one of {RESIZE_MODES}")
+    scale = min(height / source_size[0], width / source_size[1])
+    resized = (min(height, max(1, round(source_size[0] * scale))),
+               min(width, max(1, round(source_size[1] * scale))))
+    return resized, ((height - resized[0]) // 2, (width - resized[1]) // 2)
+
+
+def resize_images(images, img_size, mode='stretch', out=None):
+    """resize decoded BGR images into one RGB batch of ``img_size``
+
+    Images of the same shape that are downscaled along both axes are stacked
+    on top of each other and resized by a single ``cv2.resize`` call, which
+    shares the interpolation tables across the group. Area interpolation then
+    averages whole source rows into each output row and the image borders of
+    the stack line up with output rows, so the result equals resizing one
+    image at a time. Any upscaling makes OpenCV interpolate bilinearly, which
+    would blend rows across those borders, so such images are resized one by
+    one.
+
+    Args:
+        images (list): BGR uint8 arrays
+        img_size (tuple): (height, width) of the batch
+        mode (str, optional): ``'stretch'`` or ``'pad'``
+        out (np.ndarray, optional): zero-filled (n, height, width, 3) array to fill
+
+    Returns:
+        np.ndarray: the filled batch
+    """
+    img_size = tuple(img_size)
+    if out is None:
+        out = np.zeros((len(images), *img_size, 3), dtype=np.uint8)
+    groups = {}
+    for row, image in enumerate(images):
+        groups.setdefault(image.shape, []).append(row)
+    for (source_height, source_width, _), rows in groups.items():
+        (height, width), (top, left) = resize_geometry(
+            (source_height, source_width), img_size, mode)
+        if height <= source_height and width <= source_width:
+            stacks = [rows]
+        else:
+            stacks = [[row] for row in rows]
+        for stack_rows in stacks:
+            if len(stack_rows) == 1:
+                stack = images[stack_rows[0]]
+            else:
+                stack = np.concatenate([images[row] for row in stack_rows])
+            resized = cv2.resize(stack, (width, height * len(stack_rows)),
+                                 interpolation=cv2.INTER_AREA)
+            resized = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+            out[stack_rows, top:top + height, left:left + width] = resized.reshape(
+                len(stack_rows), height, width, 3)
+    return out
+
+
+def decode_image(data, img_size, name=None, reduced=True, source_size=None, resize_mode='stretch'):
+    """decode encoded image bytes to an RGB uint8 array of ``img_size``"""
+    image = read_image(data, img_size, name, reduced, source_size)
+    return resize_images([image], img_size, resize_mode)[0]
+
+
+def label_codes(labels, class_indices, dtype='int32'):
+    """integer codes of a labels column, raising on labels ``class_indices`` lacks"""
+    codes = labels.map(class_indices)
+    if codes.isna().any():
+        unknown = sorted(map(str, labels[codes.isna()].unique()))
+        raise ValueError(f"Labels {unknown} are not among the training classes "
+                         f"{sorted(class_indices)}")
+    return codes.to_numpy(dtype=dtype)
+
+
+def pad_batch(batch_x, batch_y, batch_size):
+    """pad a short final batch to ``batch_size`` with zero rows
+
+    Returns:
+        tuple: (batch_x, batch_y, sample_weight) where the padded rows have weight 0
+    """
+    n = len(batch_x)
+    sample_weight = np.ones(batch_size, dtype='float32')
+    if n < batch_size:
+        sample_weight[n:] = 0
+        batch_x = np.concatenate(
+            [batch_x, np.zeros((batch_size - n, *batch_x.shape[1:]), dtype=batch_x.dtype)])
+        batch_y = np.concatenate(
+            [batch_y, np.zeros((batch_size - n, *batch_y.shape[1:]), dtype=batch_y.dtype)])
+    return batch_x, batch_y, sample_weight
+
+
+class PaddedBatchSequence(Sequence):
+    """Every batch of a wrapped sequence at the full ``batch_size``.
+
+    The final batch is padded with zero rows and each batch comes with a
+    sample weight of 1 for real rows and 0 for padding, so a model compiled
+    with ``weighted_metrics`` leaves the padding out of its metrics and the
+    number of steps is ``ceil(n / batch_size)`` for any split length. Other
+    attributes (``labels``, ``class_indices``, ...) come from the wrapped
+    sequence; predictions past the first ``n`` rows are padding.
+    """
+
+    def __init__(self, sequence):
+        self.sequence = sequence
+
+    def __len__(self):
+        return len(self.sequence)
+
+    def __getitem__(self, index):
+        batch_x, batch_y = self.sequence[index][:2]
+        return pad_batch(batch_x, batch_y, self.sequence.batch_size)
+
+    def on_epoch_end(self):
+        self.sequence.on_epoch_end()
+
+    def __getattr__(self, name):
+        if name == 'sequence':
+            raise AttributeError(name)
+        return getattr(self.sequence, name)
+
+
+class DataFrameImageSequence(Sequence):
+    """Batches of decoded images for a filepaths/labels dataframe.
+
+    Mirrors the attributes of the Keras ``DataFrameIterator`` (``class_indices``,
+    ``classes``, ``labels``, ``n``, ``batch_size``) but reads the encoded image
+    bytes through ``read_bytes``, so images can come from any source such as a
+    zip archive instead of the local filesystem. With a ``sampler`` each epoch
+    reads the rows of ``sampler.epoch_indices()`` instead of a permutation.
+    Source sizes recorded in the ``image_height``/``image_width`` columns pick
+    the JPEG decode scale without parsing headers, and each batch is resized
+    with one call per distinct source size (see ``resize_images``).
+    """
+
+    def __init__(self, df, read_bytes, img_size=(224, 224), batch_size=20, shuffle=False,
+                 augmenter=None, class_indices=None, seed=None, sampler=None,
+                 resize_mode='stretch', x_col='filepaths', y_col='labels'):
+        self.read_bytes = read_bytes
+        self.img_size = tuple(img_size)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.augmenter = augmenter
+        self.sampler = sampler
+        self.resize_mode = resize_mode
+        self.filenames = df[x_col].to_numpy()
+        self.source_sizes = None
+        if set(SIZE_COLUMNS) <= set(df.columns):
+            self.source_sizes = df[SIZE_COLUMNS].to_numpy(dtype='int64')
+        if class_indices is None:
+            class_indices = {label: index for index, label in
+                             enumerate(sorted(df[y_col].unique()))}
+        self.class_indices = class_indices
+        self.classes = self.encode_classes(df, y_col)
+        self.n = len(df)
+        self._rng = np.random.default_rng(seed)
+        self.index_array = np.arange(self.n)
+        self.epoch = 0
+        self.set_index_array()
+
+    def encode_classes(self, df, y_col):
+        return label_codes(df[y_col], self.class_indices)
+
+    @property
+    def labels(self):
+        return self.classes
+
+    @property
+    def num_classes(self):
+        return len(self.class_indices)
+
+    def __len__(self):
+        return (len(self.index_array) + self.batch_size - 1) // self.batch_size
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        self.set_index_array()
+
+    def set_index_array(self):
+        if self.sampler is not None:
+            self.index_array = self.sampler.epoch_indices()
+        elif self.shuffle:
+            self.index_array = self._rng.permutation(self.n)
+
+    def load_image(self, sample):
+        path = self.filenames[sample]
+        source_size = None if self.source_sizes is None else tuple(
+            self.source_sizes[sample])
+        return read_image(self.read_bytes(path), self.img_size, path, source_size=source_size)
+
+    def load_batch(self, batch_index):
+        batch_x = np.zeros((len(batch_index), *self.img_size, 3),
+                           dtype='float32')
+        return resize_images([self.load_image(sample) for sample in batch_index],
+                             self.img_size, self.resize_mode, out=batch_x)
+
+    def augment_batch(self, batch_x, index, epoch=None):
+        """augment batch ``index``; its samples are keyed by their position in the epoch"""
+        if self.augmenter is None:
+            return batch_x
+        samples = np.arange(index * self.batch_size,
+                            index * self.batch_size + len(batch_x))
+        return self.augmenter(batch_x, samples=samples,
+                              epoch=self.epoch if epoch is None else epoch)
+
+    def __getitem__(self, index):
+        batch_index = self.index_array[index *
+                                       self.batch_size:(index + 1) * self.batch_size]
+        batch_x = self.augment_batch(self.load_batch(batch_index), index)
+        batch_y = np.eye(self.num_classes, dtype='float32')[
+            self.classes[batch_index]]
+        return batch_x, batch_y
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+import tensorflow as tf
+from cnnClassifier.components.backbones import CUSTOM_OBJECTS
+from cnnClassifier.utils.common import link_or_copy, make_read_only, remove_path, save_json
+from cnnClassifier import logger
+
+
+# save_format of model.save for each file suffix; no suffix is a SavedModel directory
+SAVE_FORMATS = {'.keras': 'keras', '.h5': 'h5', '': 'tf'}
+
+
+def save_model(model, path):
+    """save ``model`` to ``path`` as a new file, never into a stored model linked there"""
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.stem}.tmp{path.suffix}")
+    remove_path(tmp_path)
+    model.save(tmp_path, save_format=SAVE_FORMATS[path.suffix])
+    remove_path(path)
+    os.replace(tmp_path, path)
+
+
+class ModelStore:
+    """Saved models addressed by a hash of everything they are built from.
+
+    ``key(spec)`` hashes a JSON-serializable description of the model
+    (parameters, weights checksum, builder code, Keras version and file
+    format). ``<root_dir>/<key><suffix>`` holds the saved model and
+    ``<key>.json`` the spec and architecture hash, so a model whose key is
+    already stored never has to be rebuilt. Models are handed out as hard
+    links rather than copies and are only deserialized when ``load`` is
+    called. Stored models are read-only because every link shares their
+    file; write to a linked path with ``save_model``, which replaces the
+    link instead of writing through it.
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = Path(root_dir)
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    @staticmethod
+    def key(spec):
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+    def meta_path(self, key):
+        return self.root_dir / f"{key}.json"
+
+    def find(self, key):
+        """metadata of a stored model, None if it is missing"""
+        meta_path = self.meta_path(key)
+        if not meta_path.exists():
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return meta if os.path.exists(meta['path']) else None
+
+    def put(self, key, model, suffix='.keras', spec=None):
+        path = self.root_dir / f"{key}{suffix}"
+        start = time.perf_counter()
+        save_model(model, path)
+        make_read_only(path)
+        meta = {'key': key, 'path': str(path), 'spec': spec,
+                'architecture': hashlib.sha256(model.to_json().encode()).hexdigest(),
+                'save_seconds': time.perf_counter() - start, 'created': time.time()}
+        save_json(self.meta_path(key), meta)
+        logger.info(f"Stored model {key[:12]} at {path} in {meta['save_seconds']:.2f}s.")
+        return meta
+
+    def link(self, key, destination):
+        """hard link the stored model to ``destination``"""
+        meta = self.find(key)
+        if meta is None:
+            raise FileNotFoundError(f"Model {key} is not in {self.root_dir}")
+        linked = link_or_copy(Path(meta['path']), Path(destination))
+        # replacing a read-only destination may have cleared the flag on Windows
+        make_read_only(Path(meta['path']))
+        logger.info(f"{'Linked' if linked else 'Copied'} model {key[:12]} to {destination}.")
+        return Path(destination)
+
+    def load(self, key, compile=True):
+        meta = self.find(key)
+        if meta is None:
+            raise FileNotFoundError(f"Model {key} is not in {self.root_dir}")
+        return tf.keras.models.load_model(meta['path'], custom_objects=CUSTOM_OBJECTS,
+                                          compile=compile)
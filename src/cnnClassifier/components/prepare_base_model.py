@@ -1,61 +1,200 @@
+import hashlib
+import inspect
+import time
+from dataclasses import fields
+from pathlib import Path
 from cnnClassifier.constants import *
-from cnnClassifier.utils.common import read_yaml, create_directories
-from keras.applications import EfficientNetB5
-from keras.layers import Dense, Dropout, BatchNormalization
+from cnnClassifier.utils.common import read_yaml, create_directories, save_json, link_or_copy
+import keras
+from keras.layers import Dense, Dropout, BatchNormalization, Input
 from keras.models import Model
 from keras.optimizers import Adamax
 from keras import regularizers
-import tensorflow as tf
 from cnnClassifier.entity.config_entity import PrepareBaseModelConfig
+from cnnClassifier.components import backbones
+from cnnClassifier.components.weights_registry import WeightsRegistry
+from cnnClassifier.components.model_store import ModelStore
+from cnnClassifier import logger
+
+
+# classification head layers, in order; the first one takes the pooled features
+HEAD_LAYERS = ['head_batch_norm', 'head_dense_1024', 'head_dropout_1', 'head_dense_128',
+               'head_dropout_2', 'head_output']
+
+
+def add_head(x, config: PrepareBaseModelConfig):
+    x = BatchNormalization(axis=-1, momentum=0.99,
+                           epsilon=0.001, name='head_batch_norm')(x)
+    x = Dense(1024,
+              kernel_regularizer=regularizers.l2(
+                  l=config.params_dense_1024_regularizer_l2),
+              activity_regularizer=regularizers.l1(
+                  config.params_dense_1024_regularizer_l1),
+              bias_regularizer=regularizers.l1(
+                  config.params_dense_1024_regularizer_l1),
+              activation='relu', name='head_dense_1024')(x)
+    x = Dropout(rate=config.params_dropout_rate1,
+                seed=123, name='head_dropout_1')(x)
+    x = Dense(128,
+              kernel_regularizer=regularizers.l2(
+                  l=config.params_dense_128_regularizer_l2),
+              activity_regularizer=regularizers.l1(
+                  config.params_dense_128_regularizer_l1),
+              bias_regularizer=regularizers.l1(
+                  config.params_dense_128_regularizer_l1),
+              activation='relu', name='head_dense_128')(x)
+    x = Dropout(rate=config.params_dropout_rate2,
+                seed=123, name='head_dropout_2')(x)
+    return Dense(config.params_classes, activation='softmax', name='head_output')(x)
+
+
+def compile_model(model, config: PrepareBaseModelConfig):
+    model.compile(Adamax(learning_rate=config.params_learning_rate),
+                  loss='categorical_crossentropy',
+                  weighted_metrics=['accuracy'])
+    return model
+
+
+def build_head_model(feature_dim, config: PrepareBaseModelConfig):
+    """the classification head alone, taking pooled backbone features"""
+    inputs = Input(shape=(feature_dim,))
+    return compile_model(Model(inputs=inputs, outputs=add_head(inputs, config)), config)
+
+
+def split_backbone(model):
+    """the backbone of a base model, ending at the pooled features its head takes"""
+    return Model(inputs=model.input, outputs=model.get_layer(HEAD_LAYERS[0]).input)
+
+
+def copy_head_weights(source, target):
+    for name in HEAD_LAYERS:
+        target.get_layer(name).set_weights(source.get_layer(name).get_weights())
+
+
+def builder_hash():
+    """hash of the source of the functions that build the base model
+
+    Comments and helpers elsewhere in the module do not change it, so editing
+    them does not invalidate stored models.
+    """
+    functions = [backbones.build_backbone, add_head, compile_model,
+                 PrepareBaseModel.build_backbone, PrepareBaseModel.prepare_base_model]
+    return hashlib.sha256(''.join(inspect.getsource(function)
+                                  for function in functions).encode()).hexdigest()
 
 
 class PrepareBaseModel:
     def __init__(self, config: PrepareBaseModelConfig):
         self.config = config
+        self.registry = WeightsRegistry(config.weights_registry_dir)
+        self.store = ModelStore(config.model_store_dir)
+        self.build_report = {}
 
-    def prepare_base_model(self):
+    @property
+    def registry_name(self):
+        # the pooling layer is part of the registered architecture
+        suffix = '' if self.config.params_include_top else f"_notop_{self.config.params_pooling}"
+        return f"{self.config.params_model_name}{suffix}"
+
+    def resolve_weights(self):
+        """registry entry to load, or the ``weights`` argument for Keras
+
+        ``'imagenet'`` is served from the registry when it holds the backbone
+        and otherwise downloaded once and registered. ``'registry'`` or
+        ``'registry:<checksum prefix>'`` must be in the registry. Other values
+        (a weights file path or None) are passed to Keras unchanged.
+        """
+        weights = self.config.params_weights
+        if isinstance(weights, str) and weights.startswith('registry'):
+            checksum = weights.partition(':')[2] or None
+            entry = self.registry.resolve(self.registry_name, checksum)
+            if entry is None:
+                raise FileNotFoundError(
+                    f"No weights for {self.registry_name} matching {weights!r} in {self.registry.root_dir}")
+            return entry, None
+        entry = self.registry.resolve(
+            self.registry_name) if weights == 'imagenet' else None
+        return entry, None if entry is not None else weights
+
+    def build_backbone(self):
         img_shape = (*self.config.params_image_size, 3)
-        base_model = EfficientNetB5(include_top=self.config.params_include_top,
-                                    weights=self.config.params_weights,
-                                    input_shape=img_shape,
-                                    pooling=self.config.params_pooling)
+        entry, weights = self.resolve_weights()
+
+        start = time.perf_counter()
+        # a registered backbone is rebuilt from its stored architecture, which
+        # can differ from a weights=None build (e.g. EfficientNet's imagenet-only
+        # input Rescaling)
+        base_model = self.registry.architecture(
+            entry, img_shape) if entry is not None else None
+        if base_model is None:
+            if entry is not None:
+                logger.warning("Registry entry %s has no architecture, building %s from Keras.",
+                               entry['checksum'][:12], self.config.params_model_name)
+            base_model = backbones.build_backbone(self.config.params_model_name,
+                                                  include_top=self.config.params_include_top,
+                                                  weights=weights,
+                                                  input_shape=img_shape,
+                                                  pooling=self.config.params_pooling)
+        built = time.perf_counter()
+        if entry is not None:
+            self.registry.load_into(base_model, entry)
+            source = f"registry:{entry['checksum']}"
+        elif weights == 'imagenet':
+            entry = self.registry.register(
+                self.registry_name, base_model, source='imagenet')
+            source = 'imagenet (downloaded and registered)'
+        else:
+            source = str(weights)
+        loaded = time.perf_counter()
+
+        self.build_report.update({'backbone': self.registry_name, 'weights': source,
+                                  'architecture_seconds': built - start,
+                                  'weights_seconds': loaded - built})
+        return base_model
+
+    def prepare_base_model(self):
+        start = time.perf_counter()
+        base_model = self.build_backbone()
+        head_start = time.perf_counter()
 
         base_model.trainable = True
 
-        x = base_model.output
-        x = BatchNormalization(axis=-1, momentum=0.99, epsilon=0.001)(x)
-        x = Dense(1024,
-                  kernel_regularizer=regularizers.l2(
-                      l=self.config.params_dense_1024_regularizer_l2),
-                  activity_regularizer=regularizers.l1(
-                      self.config.params_dense_1024_regularizer_l1),
-                  bias_regularizer=regularizers.l1(
-                      self.config.params_dense_1024_regularizer_l1),
-                  activation='relu')(x)
-        x = Dropout(rate=self.config.params_dropout_rate1, seed=123)(x)
-        x = Dense(128,
-                  kernel_regularizer=regularizers.l2(
-                      l=self.config.params_dense_128_regularizer_l2),
-                  activity_regularizer=regularizers.l1(
-                      self.config.params_dense_128_regularizer_l1),
-                  bias_regularizer=regularizers.l1(
-                      self.config.params_dense_128_regularizer_l1),
-                  activation='relu')(x)
-        x = Dropout(rate=self.config.params_dropout_rate2, seed=123)(x)
-
-        output = Dense(self.config.params_classes, activation='softmax')(x)
-        model = Model(inputs=base_model.input, outputs=output)
-
-        model.compile(Adamax(learning_rate=self.config.params_learning_rate),
-                      loss='categorical_crossentropy',
-                      metrics=['accuracy'])
+        model = Model(inputs=base_model.input,
+                      outputs=add_head(base_model.output, self.config))
+        compile_model(model, self.config)
 
+        end = time.perf_counter()
+        self.build_report.update({'head_seconds': end - head_start,
+                                  'total_seconds': end - start})
+        logger.info("Built %s with weights from %s in %.2fs (architecture %.2fs, weights %.2fs, head %.2fs).",
+                    self.build_report['backbone'], self.build_report['weights'],
+                    self.build_report['total_seconds'], self.build_report['architecture_seconds'],
+                    self.build_report['weights_seconds'], self.build_report['head_seconds'])
+        save_json(Path(self.config.build_report_path), self.build_report)
         return model
 
+    def model_spec(self):
+        """everything the saved base model depends on, hashed into its store key"""
+        entry, weights = self.resolve_weights()
+        return {'params': {field.name: getattr(self.config, field.name)
+                           for field in fields(self.config) if field.name.startswith('params_')},
+                'weights': entry['checksum'] if entry is not None else weights,
+                'builder': builder_hash(),
+                'keras': keras.__version__,
+                'format': self.config.base_model_path.suffix}
+
     def get_base_model(self):
-        model = self.prepare_base_model()
-        model.save(self.config.base_model_path)
+        key = self.store.key(self.model_spec())
+        if self.store.find(key) is None:
+            model = self.prepare_base_model()
+            # downloaded weights are in the registry now and keyed by checksum
+            spec = self.model_spec()
+            key = self.store.key(spec)
+            self.store.put(key, model, self.config.base_model_path.suffix, spec)
+        else:
+            logger.info(f"Base model {key[:12]} is up to date, skipping the build.")
+        self.store.link(key, self.config.base_model_path)
 
     def update_base_model(self):
-        model = tf.keras.models.load_model(self.config.base_model_path)
-        model.save(self.config.updated_base_model_path)
+        link_or_copy(Path(self.config.base_model_path),
+                     Path(self.config.updated_base_model_path))
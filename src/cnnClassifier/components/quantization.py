@@ -0,0 +1,136 @@
+import time
+from pathlib import Path
+import numpy as np
+import tensorflow as tf
+from cnnClassifier.entity.config_entity import QuantizationConfig
+from cnnClassifier.components.backbones import CUSTOM_OBJECTS
+from cnnClassifier.utils.common import save_json
+from cnnClassifier import logger
+
+
+def sequence_images(sequence, limit=0):
+    """single images of an unaugmented sequence in order, at most ``limit`` if set"""
+    count = 0
+    for batch in range(len(sequence)):
+        batch_index = sequence.index_array[batch * sequence.batch_size:
+                                           (batch + 1) * sequence.batch_size]
+        for image, label in zip(sequence.load_batch(batch_index), sequence.classes[batch_index]):
+            if limit and count == limit:
+                return
+            yield image[None], label
+            count += 1
+
+
+class TFLiteClassifier:
+    def __init__(self, model_content, num_threads=1):
+        self.size = len(model_content)
+        self.interpreter = tf.lite.Interpreter(model_content=model_content,
+                                               num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]['index']
+        self.output = self.interpreter.get_output_details()[0]['index']
+
+    def __call__(self, image):
+        self.interpreter.set_tensor(self.input, image)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output)
+
+
+class Quantization:
+    """Post-training int8 quantization of the trained model for CPU serving.
+
+    Weights and activations are quantized to int8 with TFLite, calibrated on
+    images streamed from the ``valid`` split; inputs and outputs stay float32
+    so callers are unchanged. A float32 TFLite conversion of the same model
+    is the reference for the report: file size, median single-image CPU
+    latency and test accuracy of both, and how often their predictions agree.
+    """
+
+    def __init__(self, config: QuantizationConfig):
+        self.config = config
+        self.model = None
+
+    def get_model(self):
+        self.model = tf.keras.models.load_model(self.config.trained_model_path,
+                                                custom_objects=CUSTOM_OBJECTS, compile=False)
+
+    def converter(self):
+        # a fixed batch of one, the shape the interpreter is invoked with
+        forward = tf.function(lambda x: self.model(x, training=False)).get_concrete_function(
+            tf.TensorSpec((1, *self.config.params_image_size, 3), tf.float32))
+        return tf.lite.TFLiteConverter.from_concrete_functions([forward], self.model)
+
+    def convert_float32(self):
+        return self.converter().convert()
+
+    def convert_int8(self, calibration_seq):
+        converter = self.converter()
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: (
+            [image] for image, _ in sequence_images(calibration_seq, self.config.params_calibration_samples))
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        start = time.perf_counter()
+        model_content = converter.convert()
+        logger.info("Converted to int8 with %s calibration images in %.1fs.",
+                    min(calibration_seq.n, self.config.params_calibration_samples),
+                    time.perf_counter() - start)
+        return model_content
+
+    def latency(self, classifier, images):
+        """median milliseconds per image, None without images to time"""
+        if not images:
+            return None
+        classifier(images[0])
+        seconds = []
+        for image in images:
+            start = time.perf_counter()
+            classifier(image)
+            seconds.append(time.perf_counter() - start)
+        return 1000 * float(np.median(seconds))
+
+    def evaluate(self, classifiers, test_seq):
+        predictions = {name: [] for name in classifiers}
+        labels = []
+        for image, label in sequence_images(test_seq, self.config.params_eval_samples):
+            labels.append(label)
+            for name, classifier in classifiers.items():
+                predictions[name].append(int(np.argmax(classifier(image))))
+        labels = np.array(labels)
+        # latency_runs: 0 skips the timing instead of timing every image
+        images = [image for image, _ in sequence_images(
+            test_seq, self.config.params_latency_runs)] if self.config.params_latency_runs else []
+
+        report = {'samples': len(labels)}
+        for name, classifier in classifiers.items():
+            report[name] = {'size_mb': classifier.size / 2**20,
+                            'latency_ms': self.latency(classifier, images),
+                            'accuracy': float(np.mean(np.array(predictions[name]) == labels))}
+        report['accuracy_delta'] = report['int8']['accuracy'] - \
+            report['float32']['accuracy']
+        report['agreement'] = float(np.mean(np.array(predictions['int8']) ==
+                                            np.array(predictions['float32'])))
+        return report
+
+    def export(self, calibration_seq, test_seq):
+        for name, sequence in [('calibration', calibration_seq), ('test', test_seq)]:
+            if sequence.n == 0:
+                raise ValueError(f"The {name} split has no images to quantize with")
+        model_content = self.convert_int8(calibration_seq)
+        with open(self.config.tflite_model_path, 'wb') as f:
+            f.write(model_content)
+        logger.info("Int8 model saved at %s.", self.config.tflite_model_path)
+
+        classifiers = {
+            'float32': TFLiteClassifier(self.convert_float32(), self.config.params_num_threads),
+            'int8': TFLiteClassifier(model_content, self.config.params_num_threads)}
+        report = self.evaluate(classifiers, test_seq)
+        for name in classifiers:
+            latency = report[name]['latency_ms']
+            logger.info("%s: %.1f MB, %s, accuracy %.4f", name, report[name]['size_mb'],
+                        'latency not measured' if latency is None else f"{latency:.1f} ms/image",
+                        report[name]['accuracy'])
+        logger.info("Accuracy delta %+.4f, predictions agree on %.1f%% of %s test images.",
+                    report['accuracy_delta'], 100 * report['agreement'], report['samples'])
+        save_json(Path(self.config.report_path), report)
+        return report
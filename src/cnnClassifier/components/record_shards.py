@@ -0,0 +1,165 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from cnnClassifier.components.tf_data_pipeline import TFDataGenerator, AUTOTUNE
+from cnnClassifier.components.image_sequence import label_codes
+from cnnClassifier.components.zip_dataset import ZipImageSource
+from cnnClassifier.components.image_cache import file_key
+from cnnClassifier import logger
+
+
+FEATURES = {
+    'image': tf.io.FixedLenFeature([], tf.string),
+    'label': tf.io.FixedLenFeature([], tf.int64),
+    'index': tf.io.FixedLenFeature([], tf.int64, default_value=-1),
+}
+# bumped whenever the record layout changes, so old shards are rewritten
+SHARD_FORMAT = 2
+
+
+def _bytes_feature(value):
+    return tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
+
+
+def _int64_feature(value):
+    return tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
+
+
+def write_shard(shard_path, filepaths, label_codes, indices, zip_path=None):
+    """write one TFRecord shard of encoded images, label codes and split row indices"""
+    source = ZipImageSource(zip_path) if zip_path else None
+    tmp_path = f"{shard_path}.tmp"
+    with tf.io.TFRecordWriter(tmp_path) as writer:
+        for path, label, index in zip(filepaths, label_codes, indices):
+            if source is not None:
+                data = bytes(source.read(path))
+            else:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            example = tf.train.Example(features=tf.train.Features(feature={
+                'image': _bytes_feature(data),
+                'label': _int64_feature(int(label)),
+                'index': _int64_feature(int(index)),
+            }))
+            writer.write(example.SerializeToString())
+    if source is not None:
+        source.close()
+    os.replace(tmp_path, shard_path)
+    return shard_path
+
+
+class ShardWriter:
+    """Packs a split into fixed-size TFRecord shards using worker processes.
+
+    ``<shard_dir>/<split>.json`` records the shard files and a fingerprint of
+    the split's filepaths, label codes, source file keys (size and mtime, or
+    size and CRC32 for zip members) and shard size; a split whose
+    fingerprint matches is not written again. Shards of a split left over
+    from an older fingerprint are deleted when it is rewritten.
+    """
+
+    def __init__(self, shard_dir, shard_size=1024, num_workers=4, zip_path=None, stat=file_key,
+                 stat_workers=8):
+        self.shard_dir = Path(shard_dir)
+        self.shard_size = shard_size
+        self.num_workers = num_workers
+        self.zip_path = str(zip_path) if zip_path else None
+        self.stat = stat
+        self.stat_workers = stat_workers
+        os.makedirs(self.shard_dir, exist_ok=True)
+
+    def fingerprint(self, filepaths, label_codes):
+        with ThreadPoolExecutor(max_workers=self.stat_workers) as executor:
+            keys = np.array(list(executor.map(self.stat, filepaths)),
+                            dtype=np.int64).reshape(-1, 2)
+        digest = hashlib.sha256(f"{SHARD_FORMAT}:{self.shard_size}".encode())
+        digest.update(pd.util.hash_pandas_object(
+            pd.Series(filepaths), index=False).to_numpy().tobytes())
+        digest.update(label_codes.tobytes())
+        digest.update(keys.tobytes())
+        return digest.hexdigest()
+
+    def prune(self, name, shard_paths):
+        keep = set(map(os.path.abspath, shard_paths))
+        for path in self.shard_dir.glob(f"{name}-*-of-*.tfrecord"):
+            if os.path.abspath(path) not in keep:
+                os.remove(path)
+
+    def write(self, name, df, class_indices):
+        filepaths = df['filepaths'].astype(str).to_numpy()
+        codes = label_codes(df['labels'], class_indices, dtype='int64')
+        fingerprint = self.fingerprint(filepaths, codes)
+        manifest_path = self.shard_dir / f"{name}.json"
+        if manifest_path.exists():
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest['fingerprint'] == fingerprint and \
+                    all(os.path.exists(path) for path in manifest['shards']):
+                logger.info(f"Shards for {name} are up to date.")
+                return manifest['shards']
+
+        starts = range(0, len(filepaths), self.shard_size)
+        n_shards = len(starts)
+        shard_paths = [str(self.shard_dir / f"{name}-{i:05d}-of-{n_shards:05d}.tfrecord")
+                       for i in range(n_shards)]
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.num_workers, mp_context=context) as executor:
+            futures = [executor.submit(write_shard, path,
+                                       filepaths[start:start + self.shard_size],
+                                       codes[start:start + self.shard_size],
+                                       range(start, min(start + self.shard_size, len(filepaths))),
+                                       self.zip_path)
+                       for path, start in zip(shard_paths, starts)]
+            for future in futures:
+                future.result()
+
+        with open(manifest_path, 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'count': len(filepaths),
+                       'shards': shard_paths}, f, indent=4)
+        self.prune(name, shard_paths)
+        logger.info(f"Wrote {len(filepaths)} {name} images into {n_shards} shards.")
+        return shard_paths
+
+
+class ShardedRecordGenerator(TFDataGenerator):
+    """TFDataGenerator reading images from TFRecord shards.
+
+    When shuffling, the shard order is shuffled, ``cycle_length`` shards are
+    read concurrently with ``interleave`` and records are mixed through a
+    shuffle buffer; otherwise shards are read sequentially in split order.
+    The augmentation key of a record is its split row index and the epoch,
+    which does not depend on the interleaving order.
+    """
+
+    def __init__(self, df, shard_paths, cycle_length=4, shuffle_buffer=2048, **kwargs):
+        self.shard_paths = list(shard_paths)
+        self.cycle_length = cycle_length
+        self.shuffle_buffer = shuffle_buffer
+        super().__init__(df, **kwargs)
+
+    def parse(self, record, epoch):
+        example = tf.io.parse_single_example(record, FEATURES)
+        return (self.decode(example['image']), tf.cast(example['label'], tf.int32),
+                tf.stack([example['index'], epoch]))
+
+    def images(self):
+        epochs = tf.data.Dataset.from_generator(lambda: [np.full(self.n, self.next_epoch())],
+                                                output_signature=tf.TensorSpec([None], tf.int64))
+        files = tf.data.Dataset.from_tensor_slices(self.shard_paths)
+        if self.shuffle:
+            files = files.shuffle(len(self.shard_paths), seed=self.seed,
+                                  reshuffle_each_iteration=True)
+            dataset = files.interleave(tf.data.TFRecordDataset, cycle_length=self.cycle_length,
+                                       num_parallel_calls=AUTOTUNE, deterministic=False)
+            dataset = dataset.shuffle(self.shuffle_buffer, seed=self.seed,
+                                      reshuffle_each_iteration=True)
+        else:
+            dataset = tf.data.TFRecordDataset(files)
+        dataset = tf.data.Dataset.zip((dataset, epochs.unbatch()))
+        return dataset.map(self.parse, num_parallel_calls=AUTOTUNE)
@@ -0,0 +1,214 @@
+import multiprocessing
+import queue
+import time
+import traceback
+from multiprocessing import shared_memory
+import numpy as np
+from keras.utils import Sequence
+from cnnClassifier import logger
+
+
+def load_worker(worker_id, sequence, shm_name, shape, tasks, results):
+    """decode and augment batches of ``sequence`` into slots of the shared ring"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            index, slot, batch_index, epoch = task
+            start = time.perf_counter()
+            try:
+                slots[slot, :len(batch_index)] = sequence.augment_batch(
+                    sequence.load_batch(batch_index), index, epoch)
+            except Exception:
+                results.put((index, worker_id, 0.0, traceback.format_exc()))
+                continue
+            results.put((index, worker_id, time.perf_counter() - start, None))
+    finally:
+        del slots
+        shm.close()
+
+
+class SharedMemoryBatchLoader(Sequence):
+    """Runs a DataFrameImageSequence in worker processes over a shared-memory ring.
+
+    ``queue_depth`` float32 batch slots are allocated once in a
+    ``multiprocessing.shared_memory`` segment. Workers receive only the batch
+    index and slot number, decode and augment the batch straight into the slot
+    and report back; ``__getitem__`` returns a view of the slot, so no image
+    array is pickled or copied between processes. The view is valid until the
+    next ``__getitem__`` call, when its slot goes back to the workers.
+    Augmentation is keyed by sample position and epoch, so the batches do not
+    depend on the number of workers.
+
+    Batches are prefetched in order; requesting a batch out of order restarts
+    the prefetch from that batch, so pass ``shuffle=False`` to ``model.fit``
+    and let the wrapped sequence shuffle between epochs. The wrapped sequence
+    is pickled once per worker and must not hold memory-mapped arrays. Workers
+    start on the first batch and stop on ``close``.
+    """
+
+    def __init__(self, sequence, num_workers=4, queue_depth=8, poll_interval=1.0):
+        self.sequence = sequence
+        self.num_workers = num_workers
+        self.queue_depth = max(queue_depth, 2)
+        self.poll_interval = poll_interval
+        self.batch_size = sequence.batch_size
+        self.shape = (self.queue_depth, sequence.batch_size,
+                      *sequence.img_size, 3)
+        self._processes = []
+        self._shm = None
+        self._stats = np.zeros((num_workers, 3))
+
+    @property
+    def class_indices(self):
+        return self.sequence.class_indices
+
+    @property
+    def classes(self):
+        return self.sequence.classes
+
+    @property
+    def labels(self):
+        return self.sequence.labels
+
+    @property
+    def filenames(self):
+        return self.sequence.filenames
+
+    @property
+    def n(self):
+        return self.sequence.n
+
+    @property
+    def num_classes(self):
+        return self.sequence.num_classes
+
+    def __len__(self):
+        return len(self.sequence)
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=int(np.prod(self.shape)) * 4)
+        self._slots = np.ndarray(self.shape, dtype=np.float32,
+                                 buffer=self._shm.buf)
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = [context.Process(target=load_worker,
+                                           args=(worker_id, self.sequence, self._shm.name, self.shape,
+                                                 self._tasks, self._results),
+                                           daemon=True)
+                           for worker_id in range(self.num_workers)]
+        for process in self._processes:
+            process.start()
+        self._free = list(range(self.queue_depth))
+        self._in_flight = {}
+        self._ready = {}
+        self._current = None
+        self._next = 0
+        logger.info("Started %s loader workers with %s batch slots (%.1f MB).",
+                    self.num_workers, self.queue_depth, self._shm.size / 2**20)
+
+    def _dispatch(self):
+        while self._free and self._next < len(self):
+            slot = self._free.pop()
+            batch_index = self.sequence.index_array[self._next * self.batch_size:
+                                                    (self._next + 1) * self.batch_size]
+            self._tasks.put((self._next, slot, batch_index, self.sequence.epoch))
+            self._in_flight[self._next] = (slot, batch_index)
+            self._next += 1
+
+    def _collect(self):
+        while True:
+            try:
+                index, worker_id, seconds, error = self._results.get(
+                    timeout=self.poll_interval)
+                break
+            except queue.Empty:
+                dead = [process.pid for process in self._processes
+                        if not process.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Loader workers {dead} exited unexpectedly")
+        if error is not None:
+            raise RuntimeError(f"Loader worker {worker_id} failed:\n{error}")
+        slot, batch_index = self._in_flight.pop(index)
+        self._ready[index] = (slot, batch_index)
+        self._stats[worker_id] += (1, len(batch_index), seconds)
+
+    def _drain(self):
+        while self._in_flight:
+            self._collect()
+        self._free.extend(slot for slot, _ in self._ready.values())
+        self._ready.clear()
+
+    def _release(self):
+        if self._current is not None:
+            self._free.append(self._current)
+            self._current = None
+
+    def __getitem__(self, index):
+        if self._shm is None:
+            self.start()
+        self._release()
+        if index not in self._ready and index not in self._in_flight:
+            self._drain()
+            self._next = index
+        self._dispatch()
+        while index not in self._ready:
+            self._collect()
+        slot, batch_index = self._ready.pop(index)
+        self._current = slot
+        batch_y = np.eye(self.num_classes, dtype='float32')[
+            self.classes[batch_index]]
+        return self._slots[slot, :len(batch_index)], batch_y
+
+    def throughput(self):
+        """per-worker batches, images and images per second of busy time"""
+        return [{'worker': worker_id, 'batches': int(batches), 'images': int(images),
+                 'images_per_second': images / seconds if seconds else 0.0}
+                for worker_id, (batches, images, seconds) in enumerate(self._stats)]
+
+    def log_throughput(self):
+        for row in self.throughput():
+            logger.info("Loader worker %s: %s batches, %s images, %.1f images/s",
+                        row['worker'], row['batches'], row['images'], row['images_per_second'])
+
+    def on_epoch_end(self):
+        if self._shm is not None:
+            self._release()
+            self._drain()
+            self._next = 0
+            if self._stats.any():
+                self.log_throughput()
+            self._stats[:] = 0
+        self.sequence.on_epoch_end()
+
+    def close(self):
+        if self._shm is None:
+            return
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        del self._slots
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from cnnClassifier.components.image_sequence import label_codes
+from cnnClassifier.utils.image_header import SIZE_COLUMNS
+
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+class TFDataGenerator:
+    """tf.data input pipeline over a filepaths/labels dataframe.
+
+    Images are read and decoded in parallel with AUTOTUNE, augmented in-graph
+    per batch by a BatchAugmenter and prefetched. The ``class_indices``, ``classes``, ``labels``,
+    ``n`` and ``batch_size`` attributes match the Keras ``DataFrameIterator``
+    and ``dataset`` is what gets passed to ``model.fit``. With ``pad_to_batch``
+    the final batch is filled up with blank images and every batch carries a
+    sample weight that is 0 for the padding. With a ``sampler`` every pass
+    over ``dataset`` reads the rows of a new ``sampler.epoch_indices()``.
+
+    When the dataframe records source sizes (``image_height``/``image_width``)
+    and the rows are shuffled or sampled, the ``size_buckets`` most common
+    sizes that fill at least one batch are decoded without resizing, grouped
+    by size with ``group_by_window`` and resized a group at a time; images of
+    other sizes are resized one by one.
+
+    Every pass over ``dataset`` is one epoch: the row order is drawn in NumPy
+    when the pass starts and each image carries its (position, epoch) key to
+    the augmenter, so augmentation does not depend on tf.data parallelism.
+    """
+
+    def __init__(self, df, img_size=(224, 224), batch_size=20, shuffle=False, augmenter=None,
+                 class_indices=None, seed=None, read_bytes=None, reduced_decode=True,
+                 pad_to_batch=False, sampler=None, resize_mode='stretch', size_buckets=0,
+                 x_col='filepaths', y_col='labels'):
+        self.img_size = tuple(img_size)
+        self.resize_mode = resize_mode
+        self.reduced_decode = reduced_decode
+        self.pad_to_batch = pad_to_batch
+        self.sampler = sampler
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.augmenter = augmenter
+        self.seed = seed
+        self.read_bytes = read_bytes
+        self.filenames = df[x_col].astype(str).to_numpy()
+        if class_indices is None:
+            class_indices = {label: index for index, label in
+                             enumerate(sorted(df[y_col].unique()))}
+        self.class_indices = class_indices
+        self.classes = label_codes(df[y_col], class_indices)
+        self.n = len(df)
+        self.epoch = 0
+        self._rng = np.random.default_rng(seed)
+        self.buckets = self.size_buckets(df, size_buckets)
+        self.dataset = self.build()
+
+    @property
+    def labels(self):
+        return self.classes
+
+    @property
+    def num_classes(self):
+        return len(self.class_indices)
+
+    def __len__(self):
+        n = len(self.sampler) if self.sampler is not None else self.n
+        return (n + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        return iter(self.dataset)
+
+    def size_buckets(self, df, max_buckets):
+        buckets = np.full(len(df), -1, dtype=np.int64)
+        if not max_buckets or not set(SIZE_COLUMNS) <= set(df.columns):
+            return buckets
+        sizes = df[SIZE_COLUMNS].to_numpy(dtype=np.int64)
+        codes, _ = pd.factorize(sizes[:, 0] << 32 | sizes[:, 1])
+        counts = np.bincount(codes)
+        valid = np.bincount(codes, weights=sizes[:, 0] > 0) > 0
+        common = np.flatnonzero(valid & (counts >= self.batch_size))
+        common = common[np.argsort(-counts[common], kind='stable')[:max_buckets]]
+        lookup = np.full(len(counts), -1, dtype=np.int64)
+        lookup[common] = np.arange(len(common))
+        buckets[:] = lookup[codes]
+        return buckets
+
+    @property
+    def bucketed(self):
+        return (self.shuffle or self.sampler is not None) and bool((self.buckets >= 0).any())
+
+    def read_file(self, path):
+        if self.read_bytes is None:
+            return tf.io.read_file(path)
+        data = tf.py_function(lambda p: bytes(self.read_bytes(p.numpy().decode())),
+                              [path], tf.string)
+        data.set_shape([])
+        return data
+
+    def decode_jpeg_reduced(self, data):
+        shape = tf.image.extract_jpeg_shape(data)
+        target = tf.constant(self.img_size, dtype=shape.dtype)
+        # index of the largest ratio in (1, 2, 4, 8) keeping the image >= target
+        fits = tf.reduce_all(shape[:2] // tf.constant(
+            [[1], [2], [4], [8]], dtype=shape.dtype) >= target, axis=1)
+        branch = tf.reduce_sum(tf.cast(fits, tf.int32)) - 1
+        return tf.switch_case(tf.maximum(branch, 0), [
+            lambda ratio=ratio: tf.io.decode_jpeg(data, channels=3, ratio=ratio)
+            for ratio in (1, 2, 4, 8)])
+
+    def decode_raw(self, data):
+        if self.reduced_decode:
+            image = tf.cond(tf.io.is_jpeg(data),
+                            lambda: self.decode_jpeg_reduced(data),
+                            lambda: tf.io.decode_image(data, channels=3, expand_animations=False))
+        else:
+            image = tf.io.decode_image(
+                data, channels=3, expand_animations=False)
+        image.set_shape([None, None, 3])
+        return image
+
+    def resize(self, images):
+        height, width = self.img_size
+        if self.resize_mode == 'pad':
+            return tf.image.resize_with_pad(images, height, width, method='area')
+        return tf.image.resize(images, self.img_size, method='area')
+
+    def decode(self, data):
+        return self.resize(self.decode_raw(data))
+
+    def load_image(self, path, label, bucket, key):
+        return self.decode(self.read_file(path)), label, key
+
+    def load_bucketed(self, path, label, bucket, key):
+        image = self.decode_raw(self.read_file(path))
+        image = tf.cond(bucket >= 0, lambda: tf.cast(image, tf.float32),
+                        lambda: self.resize(image))
+        return image, label, bucket, key
+
+    def resize_buckets(self, dataset):
+        dataset = dataset.map(self.load_bucketed, num_parallel_calls=AUTOTUNE)
+        dataset = dataset.group_by_window(key_func=lambda x, y, bucket, key: bucket,
+                                          reduce_func=lambda key, window: window.batch(
+                                              self.batch_size),
+                                          window_size=self.batch_size)
+        return dataset.map(lambda x, y, bucket, key: (self.resize(x), y, key),
+                           num_parallel_calls=AUTOTUNE).unbatch()
+
+    def next_epoch(self):
+        epoch = self.epoch
+        self.epoch += 1
+        return epoch
+
+    def epoch_rows(self):
+        """row order of the next pass with a (position, epoch) key per row"""
+        if self.sampler is not None:
+            rows = self.sampler.epoch_indices()
+        elif self.shuffle:
+            rows = self._rng.permutation(self.n)
+        else:
+            rows = np.arange(self.n)
+        keys = np.stack([np.arange(len(rows)),
+                         np.full(len(rows), self.next_epoch())], axis=1)
+        return [(rows, keys)]
+
+    def rows(self):
+        filenames = tf.constant(self.filenames)
+        classes = tf.constant(self.classes)
+        buckets = tf.constant(self.buckets)
+        rows = tf.data.Dataset.from_generator(self.epoch_rows, output_signature=(
+            tf.TensorSpec([None], tf.int64), tf.TensorSpec([None, 2], tf.int64)))
+        return rows.unbatch().map(
+            lambda i, key: (tf.gather(filenames, i), tf.gather(classes, i), tf.gather(buckets, i), key))
+
+    def images(self):
+        if self.bucketed:
+            return self.resize_buckets(self.rows())
+        return self.rows().map(self.load_image, num_parallel_calls=AUTOTUNE)
+
+    def pad(self, dataset):
+        dataset = dataset.map(lambda x, y, key: (x, y, key, 1.0))
+        blank = (tf.zeros((*self.img_size, 3)), tf.constant(0, tf.int32),
+                 tf.zeros([2], tf.int64), tf.constant(0.0))
+        padding = len(self) * self.batch_size - self.n
+        return dataset.concatenate(tf.data.Dataset.from_tensors(blank).repeat(padding))
+
+    def build(self):
+        dataset = self.images()
+        if self.pad_to_batch:
+            dataset = self.pad(dataset)
+        dataset = dataset.batch(self.batch_size)
+        if self.augmenter is not None:
+            dataset = dataset.map(lambda x, y, key, *w: (self.augmenter.tf_apply(x, key), y, key, *w),
+                                  num_parallel_calls=AUTOTUNE)
+        num_classes = self.num_classes
+        dataset = dataset.map(lambda x, y, key, *w: (x, tf.one_hot(y, num_classes), *w),
+                              num_parallel_calls=AUTOTUNE)
+        return dataset.prefetch(AUTOTUNE)
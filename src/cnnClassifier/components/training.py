@@ -0,0 +1,92 @@
+import hashlib
+import numpy as np
+import tensorflow as tf
+from cnnClassifier.entity.config_entity import PrepareBaseModelConfig, TrainingConfig
+from cnnClassifier.components.backbones import CUSTOM_OBJECTS
+from cnnClassifier.components.embedding_cache import EmbeddingCache
+from cnnClassifier.components.model_store import ModelStore, save_model
+from cnnClassifier.components.prepare_base_model import (
+    build_head_model, copy_head_weights, split_backbone)
+from cnnClassifier import logger
+
+
+class Training:
+    """Trains the updated base model, head first.
+
+    With ``train_on_embeddings`` the frozen backbone runs once per split into
+    an EmbeddingCache and the head from ``prepare_base_model`` is trained on
+    the cached features, then copied into the full model. Fine-tuning the
+    whole model on image batches is an optional second phase.
+    """
+
+    def __init__(self, config: TrainingConfig, base_model_config: PrepareBaseModelConfig):
+        self.config = config
+        self.base_model_config = base_model_config
+        self.model = None
+
+    def get_base_model(self):
+        self.model = tf.keras.models.load_model(self.config.updated_base_model_path,
+                                                custom_objects=CUSTOM_OBJECTS)
+
+    def check_classes(self, class_indices):
+        """raise if the labels of the data do not match the width of the model output"""
+        num_classes = self.model.output_shape[-1]
+        if len(class_indices) == num_classes:
+            return
+        message = (f"The training data has {len(class_indices)} classes {sorted(class_indices)} "
+                   f"but the model predicts {num_classes}; set classes: {len(class_indices)} "
+                   f"in params.yaml and rerun prepare_base_model.")
+        if len(class_indices) == 1:
+            message += (" A single class usually means the images are not in one folder per "
+                        "label; use ingestion_mode: 'manifest' to read labels from source_csv.")
+        raise ValueError(message)
+
+    def backbone_key(self, backbone, sequence):
+        """key of the embeddings: the backbone, its weights and how images are fed to it
+
+        Head hyperparameters are left out so changing them reuses the cache.
+        """
+        weights = hashlib.sha256()
+        for array in backbone.get_weights():
+            weights.update(str(array.shape).encode())
+            weights.update(np.ascontiguousarray(array).tobytes())
+        config = self.base_model_config
+        return ModelStore.key({'model_name': config.params_model_name,
+                               'include_top': config.params_include_top,
+                               'pooling': config.params_pooling,
+                               'weights': weights.hexdigest(),
+                               'img_size': list(sequence.img_size),
+                               'resize_mode': sequence.resize_mode})
+
+    def train_head(self, train_seq, valid_seq):
+        self.check_classes(train_seq.class_indices)
+        backbone = split_backbone(self.model)
+        cache = EmbeddingCache(self.config.embedding_cache_dir, backbone,
+                               self.backbone_key(backbone, train_seq))
+        train_x, train_index = cache.build('train', train_seq)
+        valid_x, valid_index = cache.build('valid', valid_seq)
+
+        onehot = np.eye(train_seq.num_classes, dtype='float32')
+        head = build_head_model(train_x.shape[1], self.base_model_config)
+        history = head.fit(np.asarray(train_x, dtype='float32'), onehot[train_index['classes']],
+                           validation_data=(np.asarray(valid_x, dtype='float32'),
+                                            onehot[valid_index['classes']]),
+                           epochs=self.config.params_epochs,
+                           batch_size=self.config.params_batch_size, shuffle=True)
+        copy_head_weights(head, self.model)
+        logger.info("Trained the head on %s cached embeddings of size %s.",
+                    *train_x.shape)
+        return history
+
+    def fine_tune(self, train_gen, valid_gen, epochs):
+        self.check_classes(train_gen.class_indices)
+        # the generators shuffle themselves; tf.data ones expose their dataset
+        return self.model.fit(getattr(train_gen, 'dataset', train_gen),
+                              validation_data=getattr(
+                                  valid_gen, 'dataset', valid_gen),
+                              epochs=epochs, shuffle=False)
+
+    def save_model(self):
+        save_model(self.model, self.config.trained_model_path)
+        logger.info("Trained model saved at %s.",
+                    self.config.trained_model_path)
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+import numpy as np
+from keras.models import model_from_json
+from cnnClassifier.components.backbones import CUSTOM_OBJECTS
+from cnnClassifier.utils.common import file_sha256, save_json
+from cnnClassifier import logger
+
+
+# byte alignment of every array in a weights file
+ALIGNMENT = 64
+# layer config keys that may differ between builds of the same architecture
+_VOLATILE_KEYS = {'name', 'batch_input_shape', 'batch_shape'}
+
+
+def architecture_signature(architecture):
+    """class and config of every layer of a ``model.to_json()`` string, without names or input shapes"""
+    return [(layer['class_name'], {key: value for key, value in layer['config'].items()
+                                   if key not in _VOLATILE_KEYS})
+            for layer in json.loads(architecture)['config']['layers']]
+
+
+def with_input_shape(architecture, input_shape):
+    config = json.loads(architecture)
+    for layer in config['config']['layers']:
+        if layer['class_name'] == 'InputLayer':
+            layer['config']['batch_input_shape'] = [None, *input_shape]
+    return json.dumps(config)
+
+
+class WeightsRegistry:
+    """Backbone weights kept offline in the artifacts tree.
+
+    Every entry is keyed by backbone name and the sha256 of its weights file.
+    ``<root_dir>/<name>/<sha256>.bin`` holds the arrays of ``model.weights``
+    back to back as raw bytes and ``<sha256>.json`` their names, dtypes,
+    shapes and offsets plus the ``to_json()`` architecture of the registered
+    model; ``registry.json`` lists the entries of every backbone. ``build``
+    recreates that exact architecture (e.g. the extra input ``Rescaling``
+    Keras adds only for ``weights='imagenet'``), at any input shape, and
+    fills it from a memory map of the file, so building a model never touches
+    the network or the Keras cache. ``load_into`` refuses models whose layer
+    configs differ from the registered ones.
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = Path(root_dir)
+        self.index_path = self.root_dir / 'registry.json'
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def read_index(self):
+        if not self.index_path.exists():
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def resolve(self, name, checksum=None):
+        """entry of ``name`` whose checksum starts with ``checksum``, the latest one if not given"""
+        entries = self.read_index().get(name, {})
+        matches = [entry for key, entry in entries.items()
+                   if checksum is None or key.startswith(checksum)]
+        if not matches:
+            return None
+        return max(matches, key=lambda entry: entry['registered'])
+
+    def register(self, name, model, source=None):
+        """store the weights of ``model`` under ``name`` and return the entry"""
+        directory = self.root_dir / name
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = directory / 'weights.bin.tmp'
+        digest = hashlib.sha256()
+        arrays = []
+        offset = 0
+        with open(tmp_path, 'wb') as f:
+            for variable in model.weights:
+                value = np.asarray(variable.numpy(), order='C')
+                padding = -offset % ALIGNMENT
+                f.write(b'\0' * padding)
+                digest.update(b'\0' * padding)
+                offset += padding
+                data = value.tobytes()
+                f.write(data)
+                digest.update(data)
+                arrays.append({'name': variable.name, 'dtype': value.dtype.str,
+                               'shape': list(value.shape), 'offset': offset})
+                offset += len(data)
+
+        checksum = digest.hexdigest()
+        weights_path = directory / f"{checksum}.bin"
+        os.replace(tmp_path, weights_path)
+        save_json(directory / f"{checksum}.json",
+                  {'arrays': arrays, 'architecture': model.to_json()})
+        stat = weights_path.stat()
+        entry = {'name': name, 'checksum': checksum, 'path': str(weights_path),
+                 'layout': str(directory / f"{checksum}.json"), 'size': stat.st_size,
+                 'mtime_ns': stat.st_mtime_ns, 'arrays': len(arrays),
+                 'source': source, 'registered': time.time()}
+        index = self.read_index()
+        index.setdefault(name, {})[checksum] = entry
+        save_json(self.index_path, index)
+        logger.info(f"Registered {len(arrays)} weight arrays of {name} as {checksum[:12]} "
+                    f"({stat.st_size / 2**20:.1f} MB).")
+        return entry
+
+    def verify(self, entry):
+        """check the weights file against its checksum unless size and mtime are unchanged"""
+        stat = os.stat(entry['path'])
+        if (stat.st_size, stat.st_mtime_ns) == (entry['size'], entry['mtime_ns']):
+            return
+        if file_sha256(Path(entry['path'])) != entry['checksum']:
+            raise ValueError(
+                f"Weights file {entry['path']} does not match checksum {entry['checksum']}")
+
+    def read_layout(self, entry):
+        with open(entry['layout']) as f:
+            return json.load(f)
+
+    def load_arrays(self, entry, layout=None):
+        """memory-mapped views of the arrays of an entry"""
+        self.verify(entry)
+        layout = layout or self.read_layout(entry)
+        blob = np.memmap(entry['path'], dtype=np.uint8, mode='r')
+        return [np.frombuffer(blob, dtype=array['dtype'], count=int(np.prod(array['shape'])),
+                              offset=array['offset']).reshape(array['shape'])
+                for array in layout['arrays']]
+
+    def architecture(self, entry, input_shape=None):
+        """the registered model without weights, taking ``input_shape`` if given;
+        None for entries registered without their architecture"""
+        architecture = self.read_layout(entry).get('architecture')
+        if architecture is None:
+            return None
+        if input_shape is not None:
+            architecture = with_input_shape(architecture, input_shape)
+        return model_from_json(architecture, custom_objects=CUSTOM_OBJECTS)
+
+    def build(self, entry, input_shape=None):
+        """the registered model with its weights, taking ``input_shape`` if given"""
+        model = self.architecture(entry, input_shape)
+        if model is None:
+            raise ValueError(f"Entry {entry['checksum']} of {entry['name']} has no architecture")
+        return self.load_into(model, entry)
+
+    def load_into(self, model, entry):
+        layout = self.read_layout(entry)
+        if 'architecture' in layout:
+            expected = architecture_signature(layout['architecture'])
+            actual = architecture_signature(model.to_json())
+            if len(expected) != len(actual):
+                raise ValueError(f"{entry['name']} has {len(expected)} layers in the registry, "
+                                 f"the model has {len(actual)}")
+            for index, (registered, built) in enumerate(zip(expected, actual)):
+                if registered != built:
+                    raise ValueError(f"Layer {index} of {entry['name']} differs from the registry: "
+                                     f"{built} instead of {registered}")
+        model.set_weights(self.load_arrays(entry, layout))
+        return model
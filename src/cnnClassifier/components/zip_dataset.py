@@ -0,0 +1,117 @@
+import mmap
+import posixpath
+import struct
+import threading
+import zipfile
+import zlib
+from pathlib import Path
+from cnnClassifier.constants import IMAGE_EXTENSIONS
+from cnnClassifier import logger
+
+
+_LOCAL_HEADER = struct.Struct('<4s5H3I2H')
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+class ZipImageSource:
+    """Random-access reader over the members of a zip archive.
+
+    The central directory is indexed once when the source is opened. Stored
+    members are served as zero-copy views into a memory map of the archive
+    and deflated members are inflated straight from the mapped bytes, so no
+    member is ever extracted to disk.
+    """
+
+    def __init__(self, zip_path):
+        self.zip_path = Path(zip_path)
+        self._open()
+
+    def _open(self):
+        self._file = open(self.zip_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._lock = threading.Lock()
+        self._zipfile = zipfile.ZipFile(self._file)
+        self._index = {}
+        for info in self._zipfile.infolist():
+            if info.is_dir() or info.flag_bits & 0x1:
+                continue
+            self._index[info.filename] = (self._data_offset(info),
+                                          info.compress_size,
+                                          info.compress_type,
+                                          info.file_size,
+                                          info.CRC)
+        logger.info(f"Indexed {len(self._index)} members of {self.zip_path}.")
+
+    def _data_offset(self, info):
+        header = _LOCAL_HEADER.unpack_from(self._mmap, info.header_offset)
+        if header[0] != _LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(
+                f"Bad local header for member {info.filename}")
+        name_length, extra_length = header[-2:]
+        return info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def names(self, extensions=IMAGE_EXTENSIONS):
+        return [name for name in self._index
+                if name.lower().endswith(extensions)]
+
+    def stat(self, name):
+        """Uncompressed size and CRC32 of a member."""
+        return self._index[name][3:]
+
+    def read(self, name):
+        offset, compress_size, compress_type = self._index[name][:3]
+        data = self._view[offset:offset + compress_size]
+        if compress_type == zipfile.ZIP_STORED:
+            return data
+        if compress_type == zipfile.ZIP_DEFLATED:
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+        with self._lock:
+            return self._zipfile.read(name)
+
+    def read_prefix(self, name, size=None):
+        """First ``size`` bytes of a member, inflating no more than that; all of it when size is None."""
+        if size is None:
+            return self.read(name)
+        offset, compress_size, compress_type = self._index[name][:3]
+        data = self._view[offset:offset + compress_size]
+        if compress_type == zipfile.ZIP_STORED:
+            return data[:size]
+        if compress_type == zipfile.ZIP_DEFLATED:
+            return zlib.decompressobj(-zlib.MAX_WBITS).decompress(data, size)
+        return self.read(name)[:size]
+
+    def close(self):
+        self._zipfile.close()
+        try:
+            self._view.release()
+            self._mmap.close()
+        except BufferError:
+            logger.warning(
+                "Member views of %s are still referenced, leaving the mapping open.", self.zip_path)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        return {'zip_path': self.zip_path}
+
+    def __setstate__(self, state):
+        self.zip_path = state['zip_path']
+        self._open()
+
+
+def member_label(name):
+    """Label of a zip member, taken from its parent directory like os.walk does."""
+    parent = posixpath.dirname(name)
+    return posixpath.basename(parent) if parent else ''
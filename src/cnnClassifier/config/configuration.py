@@ -7,9 +7,9 @@ import zipfile
 from sklearn.model_selection import train_test_split
 import shutil
 from cnnClassifier.constants import CONFIG_FILE_PATH, PARAMS_FILE_PATH
-from cnnClassifier.utils.common import read_yaml, create_directories, get_size
+from cnnClassifier.utils.common import read_yaml, create_directories, get_size, extract_zip_incremental, copy_file_resumable
 from cnnClassifier.entity.config_entity import (
-    DataIngestionConfig, PrepareBaseModelConfig)
+    DataIngestionConfig, PrepareBaseModelConfig, TrainingConfig, QuantizationConfig)
 from cnnClassifier import logger
 from keras.applications import EfficientNetB5
 from keras.layers import Dense, Dropout, BatchNormalization
@@ -29,20 +29,31 @@ class ConfigurationManager:
             self.config.prepare_base_model.root_dir
         ])
 
+    def fetch_data(self):
+        """copy the source zip and, unless reading from it directly, extract it
+
+        Only the data ingestion stage calls this; later stages read the
+        artifacts it leaves behind.
+        """
+        self.copy_zip_data()
+        if not self.params.data_ingestion.read_from_zip:
+            self.unzip_data()
+
     def copy_zip_data(self):
         source_path = self.config.data_ingestion.source
         destination_path = self.config.data_ingestion.local_data_file
-        if not os.path.exists(destination_path):
-            shutil.copy2(source_path, destination_path)
+        if copy_file_resumable(Path(source_path), Path(destination_path)):
             logger.info(
                 f"Zip file copied from {source_path} to {destination_path}.")
         else:
-            logger.info(f"File {destination_path} already exists.")
+            logger.info(f"File {destination_path} is up to date.")
 
     def unzip_data(self):
         try:
-            with zipfile.ZipFile(self.config.data_ingestion.local_data_file, 'r') as zip_ref:
-                zip_ref.extractall(self.config.data_ingestion.unzip_dir)
+            extract_zip_incremental(Path(self.config.data_ingestion.local_data_file),
+                                    Path(self.config.data_ingestion.unzip_dir),
+                                    Path(self.config.data_ingestion.unzip_manifest),
+                                    max_workers=self.params.data_ingestion.unzip_workers)
             logger.info("Zip file extracted successfully.")
         except FileNotFoundError:
             logger.error(
@@ -57,8 +68,6 @@ class ConfigurationManager:
         params = self.params.data_ingestion
 
         create_directories([config.root_dir, params.working_dir])
-        self.copy_zip_data()
-        self.unzip_data()
 
         data_ingestion_config = DataIngestionConfig(
             root_dir=config.root_dir,
@@ -66,14 +75,42 @@ class ConfigurationManager:
             local_data_file=config.local_data_file,
             unzip_dir=config.unzip_dir,
             source_csv=config.source_csv,
+            file_index_path=Path(config.file_index_path),
+            image_cache_dir=Path(config.image_cache_dir),
+            shard_dir=Path(config.shard_dir),
             train_size=params.train_size,
             test_size=params.test_size,
             validation_size=params.validation_size,
             random_state=params.random_state,
             max_samples=params.max_samples,
             min_samples=params.min_samples,
+            oversample_floor=params.oversample_floor,
+            rebalance=params.rebalance,
             img_size=params.img_size,
-            working_dir=params.working_dir
+            working_dir=params.working_dir,
+            batch_size=params.batch_size,
+            eval_batch_size=params.eval_batch_size,
+            horizontal_flip=params.horizontal_flip,
+            rotation_range=params.rotation_range,
+            width_shift_range=params.width_shift_range,
+            height_shift_range=params.height_shift_range,
+            zoom_range=params.zoom_range,
+            read_from_zip=params.read_from_zip,
+            scan_workers=params.scan_workers,
+            ingestion_mode=params.ingestion_mode,
+            manifest_path_column=params.manifest_path_column,
+            manifest_label_column=params.manifest_label_column,
+            manifest_image_dir=params.manifest_image_dir,
+            split_format=params.split_format,
+            loader_backend=params.loader_backend,
+            resize_mode=params.resize_mode,
+            size_buckets=params.size_buckets,
+            shard_size=params.shard_size,
+            shard_workers=params.shard_workers,
+            shard_cycle_length=params.shard_cycle_length,
+            shuffle_buffer=params.shuffle_buffer,
+            loader_workers=params.loader_workers,
+            loader_queue_depth=params.loader_queue_depth
         )
 
         return data_ingestion_config
@@ -86,6 +123,9 @@ class ConfigurationManager:
             root_dir=Path(config.root_dir),
             base_model_path=Path(config.base_model_path),
             updated_base_model_path=Path(config.updated_base_model_path),
+            weights_registry_dir=Path(config.weights_registry_dir),
+            model_store_dir=Path(config.model_store_dir),
+            build_report_path=Path(config.build_report_path),
             params_image_size=self.params.base_model.image_size,
             params_learning_rate=self.params.learning_rate,
             params_include_top=self.params.base_model.include_top,
@@ -102,3 +142,41 @@ class ConfigurationManager:
         )
 
         return prepare_base_model_config
+
+    def get_training_config(self) -> TrainingConfig:
+        config = self.config.training
+        create_directories([config.root_dir])
+
+        training_config = TrainingConfig(
+            root_dir=Path(config.root_dir),
+            trained_model_path=Path(config.trained_model_path),
+            updated_base_model_path=Path(
+                self.config.prepare_base_model.updated_base_model_path),
+            embedding_cache_dir=Path(config.embedding_cache_dir),
+            params_epochs=self.params.epochs,
+            params_batch_size=self.params.data_ingestion.batch_size,
+            params_train_on_embeddings=self.params.train_on_embeddings,
+            params_fine_tune_epochs=self.params.fine_tune_epochs,
+            params_embedding_batch_size=self.params.embedding_batch_size
+        )
+
+        return training_config
+
+    def get_quantization_config(self) -> QuantizationConfig:
+        config = self.config.quantization
+        params = self.params.quantization
+        create_directories([config.root_dir])
+
+        quantization_config = QuantizationConfig(
+            root_dir=Path(config.root_dir),
+            trained_model_path=Path(self.config.training.trained_model_path),
+            tflite_model_path=Path(config.tflite_model_path),
+            report_path=Path(config.report_path),
+            params_image_size=self.params.base_model.image_size,
+            params_calibration_samples=params.calibration_samples,
+            params_eval_samples=params.eval_samples,
+            params_latency_runs=params.latency_runs,
+            params_num_threads=params.num_threads
+        )
+
+        return quantization_config
@@ -15,9 +15,12 @@ class DataIngestionConfig:
     random_state: int = None
     max_samples: int = None
     min_samples: int = None
+    oversample_floor: int = 0
+    rebalance: str = 'trim'
     img_size: list = None
     working_dir: str = None
     batch_size: int = None
+    eval_batch_size: int = 64
     color_mode: str = 'rgb'
     class_mode: str = 'categorical'
     horizontal_flip: bool = True
@@ -25,6 +28,25 @@ class DataIngestionConfig:
     width_shift_range: float = 0.2
     height_shift_range: float = 0.2
     zoom_range: float = 0.2
+    read_from_zip: bool = False
+    scan_workers: int = 16
+    file_index_path: Path = None
+    ingestion_mode: str = 'directory'
+    manifest_path_column: str = 'images'
+    manifest_label_column: str = 'label'
+    manifest_image_dir: str = ''
+    split_format: str = 'feather'
+    loader_backend: str = 'keras'
+    resize_mode: str = 'stretch'
+    size_buckets: int = 8
+    image_cache_dir: Path = None
+    shard_dir: Path = None
+    shard_size: int = 1024
+    shard_workers: int = 4
+    shard_cycle_length: int = 4
+    shuffle_buffer: int = 2048
+    loader_workers: int = 4
+    loader_queue_depth: int = 8
 
 
 @dataclass(frozen=True)
@@ -32,6 +54,9 @@ class PrepareBaseModelConfig:
     root_dir: Path
     base_model_path: Path
     updated_base_model_path: Path
+    weights_registry_dir: Path
+    model_store_dir: Path
+    build_report_path: Path
     params_image_size: list
     params_learning_rate: float
     params_include_top: bool
@@ -45,3 +70,29 @@ class PrepareBaseModelConfig:
     params_dense_1024_regularizer_l1: float
     params_dense_128_regularizer_l2: float
     params_dense_128_regularizer_l1: float
+
+
+@dataclass(frozen=True)
+class TrainingConfig:
+    root_dir: Path
+    trained_model_path: Path
+    updated_base_model_path: Path
+    embedding_cache_dir: Path
+    params_epochs: int
+    params_batch_size: int
+    params_train_on_embeddings: bool
+    params_fine_tune_epochs: int
+    params_embedding_batch_size: int
+
+
+@dataclass(frozen=True)
+class QuantizationConfig:
+    root_dir: Path
+    trained_model_path: Path
+    tflite_model_path: Path
+    report_path: Path
+    params_image_size: list
+    params_calibration_samples: int
+    params_eval_samples: int
+    params_latency_runs: int
+    params_num_threads: int
@@ -13,6 +13,7 @@ class DataIngestionTrainingPipeline:
     def main(self):
         logger.info("Fetching configuration for data ingestion.")
         config_manager = ConfigurationManager()
+        config_manager.fetch_data()
         data_ingestion_config = config_manager.get_data_ingestion_config()
         logger.info("Configuration fetched successfully.")
 
@@ -21,7 +22,7 @@ class DataIngestionTrainingPipeline:
         data_ingestion = DataIngestion(config=data_ingestion_config)
         logger.info("DataIngestion initialized successfully.")
 
-        # The data ingestion process, including file downloading and extraction, is executed here
+        # Loading, splitting and batching the fetched data is executed here
         logger.info("Executing data ingestion process.")
         train_df, test_df, valid_df, train_gen, valid_gen, test_gen, test_batch_size, test_steps = data_ingestion.execute()
         logger.info("Data ingestion process executed successfully.")
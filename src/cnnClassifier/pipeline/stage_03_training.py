@@ -0,0 +1,58 @@
+from cnnClassifier.config.configuration import ConfigurationManager
+from cnnClassifier.components.data_ingestion import DataIngestion
+from cnnClassifier.components.training import Training
+from cnnClassifier import logger
+
+
+STAGE_NAME = "Training"
+
+
+class ModelTrainingPipeline:
+    def __init__(self):
+        self.config_manager = ConfigurationManager()
+
+    def main(self):
+        training_config = self.config_manager.get_training_config()
+        base_model_config = self.config_manager.get_prepare_base_model_config()
+        data_ingestion = DataIngestion(
+            config=self.config_manager.get_data_ingestion_config())
+        train_df = data_ingestion.load_data('train')
+        valid_df = data_ingestion.load_data('valid')
+
+        training = Training(config=training_config,
+                            base_model_config=base_model_config)
+        training.get_base_model()
+
+        # Train the head on cached backbone features
+        epochs = training_config.params_epochs
+        if training_config.params_train_on_embeddings:
+            train_seq, valid_seq = data_ingestion.create_embedding_sequences(
+                [train_df, valid_df], img_size=tuple(base_model_config.params_image_size),
+                batch_size=training_config.params_embedding_batch_size)
+            training.train_head(train_seq, valid_seq)
+            epochs = training_config.params_fine_tune_epochs
+
+        # Train or fine-tune the whole model on image batches
+        if epochs:
+            test_df = data_ingestion.load_data('test')
+            train_gen, valid_gen, *_ = data_ingestion.create_generators(
+                train_df, valid_df, test_df, img_size=tuple(base_model_config.params_image_size),
+                batch_size=training_config.params_batch_size)
+            training.fine_tune(train_gen, valid_gen, epochs)
+
+        training.save_model()
+
+    def run(self):
+        logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
+        try:
+            self.main()
+            logger.info(
+                f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
+        except Exception as e:
+            logger.exception(e)
+            raise e
+
+
+if __name__ == '__main__':
+    pipeline = ModelTrainingPipeline()
+    pipeline.run()
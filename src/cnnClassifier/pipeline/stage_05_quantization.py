@@ -0,0 +1,43 @@
+from cnnClassifier.config.configuration import ConfigurationManager
+from cnnClassifier.components.data_ingestion import DataIngestion
+from cnnClassifier.components.quantization import Quantization
+from cnnClassifier import logger
+
+
+STAGE_NAME = "Int8 quantization"
+
+
+class QuantizationPipeline:
+    def __init__(self):
+        self.config_manager = ConfigurationManager()
+
+    def main(self):
+        quantization_config = self.config_manager.get_quantization_config()
+        data_ingestion = DataIngestion(
+            config=self.config_manager.get_data_ingestion_config())
+
+        # Calibrate on the valid split and compare on the test split,
+        # with class codes from the train split
+        _, valid_seq, test_seq = data_ingestion.create_embedding_sequences(
+            [data_ingestion.load_data(split) for split in ['train', 'valid', 'test']],
+            img_size=tuple(quantization_config.params_image_size),
+            batch_size=data_ingestion.config.eval_batch_size)
+
+        quantization = Quantization(config=quantization_config)
+        quantization.get_model()
+        quantization.export(valid_seq, test_seq)
+
+    def run(self):
+        logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
+        try:
+            self.main()
+            logger.info(
+                f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
+        except Exception as e:
+            logger.exception(e)
+            raise e
+
+
+if __name__ == '__main__':
+    pipeline = QuantizationPipeline()
+    pipeline.run()
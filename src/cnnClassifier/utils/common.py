@@ -9,6 +9,14 @@ from box import ConfigBox
 from pathlib import Path
 from typing import Any
 import base64
+import errno
+import hashlib
+import shutil
+import stat
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
 
 
 @ensure_annotations
@@ -122,6 +130,263 @@ def get_size(path: Path) -> str:
     return f"~ {size_in_kb} KB"
 
 
+@ensure_annotations
+def extract_zip_incremental(zip_path: Path, unzip_dir: Path, manifest_path: Path, max_workers: int = 8) -> dict:
+    """extract only the zip members that changed since the previous run
+
+    Members are compared by the CRC32 and size recorded in the zip central
+    directory against the manifest written by the previous extraction. New or
+    changed members are extracted in a thread pool and files that are no
+    longer in the archive are deleted.
+
+    Args:
+        zip_path (Path): path to the zip archive
+        unzip_dir (Path): directory to extract into
+        manifest_path (Path): path to the json manifest of the previous run
+        max_workers (int, optional): extraction threads. Defaults to 8.
+
+    Returns:
+        dict: number of extracted, unchanged and removed members
+    """
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        members = [info for info in zip_ref.infolist() if not info.is_dir()]
+
+    manifest = {}
+    pending = []
+    for info in members:
+        parts = info.filename.split('/')
+        if info.filename.startswith('/') or '..' in parts:
+            raise ValueError(f"Unsafe member path in zip: {info.filename}")
+        manifest[info.filename] = [info.CRC, info.file_size]
+        target = os.path.join(unzip_dir, *parts)
+        unchanged = (previous.get(info.filename) == manifest[info.filename]
+                     and os.path.isfile(target)
+                     and os.path.getsize(target) == info.file_size)
+        if not unchanged:
+            pending.append((info, target))
+
+    for directory in {os.path.dirname(target) for _, target in pending}:
+        os.makedirs(directory, exist_ok=True)
+
+    local = threading.local()
+    handles = []
+
+    def extract(item):
+        info, target = item
+        if not hasattr(local, 'zip_ref'):
+            local.zip_ref = zipfile.ZipFile(zip_path)
+            handles.append(local.zip_ref)
+        with local.zip_ref.open(info) as src, open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(extract, pending))
+    finally:
+        for handle in handles:
+            handle.close()
+
+    removed = [name for name in previous if name not in manifest]
+    for name in removed:
+        target = os.path.join(unzip_dir, *name.split('/'))
+        if os.path.isfile(target):
+            os.remove(target)
+
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+    summary = {'extracted': len(pending),
+               'unchanged': len(members) - len(pending),
+               'removed': len(removed)}
+    logger.info(f"incremental extraction of {zip_path}: {summary}")
+    return summary
+
+
+@ensure_annotations
+def file_sha256(path: Path, chunk_size: int = 8 * 1024 * 1024) -> str:
+    """streaming sha256 of a file
+
+    Args:
+        path (Path): path of the file
+        chunk_size (int, optional): bytes read per step. Defaults to 8 MB.
+
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy_range(src_fd, dst_fd, offset, count):
+    if hasattr(os, 'copy_file_range'):
+        try:
+            return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+    if hasattr(os, 'sendfile'):
+        try:
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            return os.sendfile(dst_fd, src_fd, offset, count)
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                raise
+    if hasattr(os, 'pread'):
+        data = os.pread(src_fd, count, offset)
+        return os.pwrite(dst_fd, data, offset)
+    # Windows has none of the above
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    data = os.read(src_fd, count)
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    return os.write(dst_fd, data)
+
+
+@ensure_annotations
+def copy_file_resumable(source: Path, destination: Path, chunk_size: int = 64 * 1024 * 1024) -> bool:
+    """copy a file in resumable chunks and verify it with sha256
+
+    The copy is skipped when the sha256 stored next to the destination
+    matches the source. Otherwise data is copied into ``<destination>.part``
+    with copy_file_range/sendfile where available, continuing from an
+    existing partial file, and the result is verified before it replaces the
+    destination.
+
+    Args:
+        source (Path): path of the file to copy
+        destination (Path): path of the copy
+        chunk_size (int, optional): bytes copied per step. Defaults to 64 MB.
+
+    Raises:
+        IOError: if the copied file does not match the source hash
+
+    Returns:
+        bool: False if the destination was already up to date
+    """
+    source_hash = file_sha256(source)
+    source_size = os.path.getsize(source)
+    hash_path = Path(f"{destination}.sha256")
+    part_path = Path(f"{destination}.part")
+
+    if os.path.exists(destination) and os.path.exists(hash_path):
+        with open(hash_path) as f:
+            stored_hash = f.read().split()[0]
+        if stored_hash == source_hash and os.path.getsize(destination) == source_size:
+            logger.info(f"{destination} matches {source} (sha256 {source_hash}), skipping copy")
+            return False
+
+    for attempt in range(2):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset > source_size:
+            offset = 0
+        if offset:
+            logger.info(f"resuming copy of {source} at byte {offset}")
+        with open(source, 'rb') as src, open(part_path, 'r+b' if offset else 'wb') as dst, \
+                tqdm(total=source_size, initial=offset, unit='B', unit_scale=True,
+                     desc=os.path.basename(destination)) as progress:
+            dst.truncate(offset)
+            while offset < source_size:
+                copied = _copy_range(src.fileno(), dst.fileno(), offset,
+                                     min(chunk_size, source_size - offset))
+                if copied == 0:
+                    raise IOError(f"unexpected end of file while copying {source}")
+                offset += copied
+                progress.update(copied)
+
+        if file_sha256(part_path) == source_hash:
+            break
+        os.remove(part_path)
+        if attempt:
+            raise IOError(f"sha256 of the copy of {source} does not match the source")
+        logger.warning(f"sha256 mismatch after copying {source}, restarting from scratch")
+
+    shutil.copystat(source, part_path)
+    os.replace(part_path, destination)
+    with open(hash_path, "w") as f:
+        f.write(f"{source_hash}  {os.path.basename(destination)}\n")
+    logger.info(f"copied {source} to {destination} (sha256 {source_hash})")
+    return True
+
+
+def _remove_read_only(func, path, exc_info=None):
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+@ensure_annotations
+def remove_path(path: Path):
+    """delete a file, link or directory tree, read-only files included
+
+    Args:
+        path (Path): path to delete, nothing happens if it does not exist
+    """
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, onerror=_remove_read_only)
+    elif os.path.lexists(path):
+        try:
+            os.remove(path)
+        except PermissionError:
+            _remove_read_only(os.remove, path)
+
+
+@ensure_annotations
+def make_read_only(path: Path):
+    """clear the write bits of a file or of every file in a directory tree
+
+    Args:
+        path (Path): file or directory
+    """
+    files = [path] if not os.path.isdir(path) else \
+        [os.path.join(root, name) for root, _, names in os.walk(path) for name in names]
+    for file in files:
+        os.chmod(file, stat.S_IMODE(os.stat(file).st_mode) &
+                 ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+@ensure_annotations
+def link_or_copy(source: Path, destination: Path) -> bool:
+    """hard link a file or directory tree, copying where links are not possible
+
+    An existing destination is replaced. Directories are recreated and
+    every file inside them is linked. A hard link shares its file with the
+    source, so replace the destination (see ``remove_path``) instead of
+    writing to it in place.
+
+    Args:
+        source (Path): file or directory to link
+        destination (Path): path of the link
+
+    Returns:
+        bool: True if everything was hard linked, False if anything was copied
+    """
+    remove_path(destination)
+
+    linked = True
+
+    def link(src, dst):
+        nonlocal linked
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+            linked = False
+
+    if os.path.isdir(source):
+        shutil.copytree(source, destination, copy_function=link)
+    else:
+        link(source, destination)
+    return linked
+
+
 def decodeImage(imgstring, fileName):
     imgdata = base64.b64decode(imgstring)
     with open(fileName, 'wb') as f:
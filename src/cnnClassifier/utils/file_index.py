@@ -0,0 +1,164 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+import joblib
+import numpy as np
+import pandas as pd
+from cnnClassifier.constants import IMAGE_EXTENSIONS
+from cnnClassifier import logger
+
+
+def scan_directory(path, extensions=IMAGE_EXTENSIONS):
+    """list one directory with os.scandir
+
+    Args:
+        path (str): directory to list
+        extensions (tuple, optional): lower-case file extensions to keep
+
+    Returns:
+        tuple: sorted image file names, sorted subdirectory paths and the
+            number of entries in the directory
+    """
+    files = []
+    subdirs = []
+    n_entries = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            n_entries += 1
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.name.lower().endswith(extensions):
+                files.append(entry.name)
+    files.sort()
+    subdirs.sort()
+    return files, subdirs, n_entries
+
+
+def scan_tree(root_dir, extensions=IMAGE_EXTENSIONS, max_workers=16):
+    """scan a directory tree, listing subdirectories in a thread pool
+
+    Args:
+        root_dir (str): root of the tree
+        extensions (tuple, optional): lower-case file extensions to keep
+        max_workers (int, optional): scanning threads. Defaults to 16.
+
+    Returns:
+        dict: image file names keyed by directory path
+    """
+    tree = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(scan_directory, root_dir, extensions): root_dir}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                files, subdirs, _ = future.result()
+                tree[path] = files
+                for subdir in subdirs:
+                    pending[executor.submit(
+                        scan_directory, subdir, extensions)] = subdir
+    return tree
+
+
+def tree_to_frame(tree):
+    """build the filepaths/labels frame from scanned directories
+
+    Labels are the directory names, stored as a categorical column, and
+    filepaths are stored as Arrow-backed strings.
+
+    Args:
+        tree (dict): image file names keyed by directory path
+
+    Returns:
+        pd.DataFrame: filepaths and labels columns
+    """
+    directories = sorted(path for path, files in tree.items() if files)
+    filepaths = [os.path.join(directory, name)
+                 for directory in directories for name in tree[directory]]
+    dir_labels = [os.path.basename(directory) for directory in directories]
+    categories = sorted(set(dir_labels))
+    label_codes = np.repeat(
+        np.searchsorted(categories, dir_labels).astype('int32'),
+        [len(tree[directory]) for directory in directories])
+    return pd.DataFrame({
+        'filepaths': pd.Series(filepaths, dtype='string[pyarrow]'),
+        'labels': pd.Categorical.from_codes(label_codes, categories=categories)
+    })
+
+
+def scan_image_files(root_dir, extensions=IMAGE_EXTENSIONS, max_workers=16):
+    """scan a directory tree for images
+
+    Args:
+        root_dir (str): root of the tree
+        extensions (tuple, optional): lower-case file extensions to keep
+        max_workers (int, optional): scanning threads. Defaults to 16.
+
+    Returns:
+        pd.DataFrame: filepaths and labels columns
+    """
+    return tree_to_frame(scan_tree(root_dir, extensions, max_workers))
+
+
+class FileIndex:
+    """Image listing of a directory tree persisted between runs.
+
+    Every directory's mtime, entry count, image files and subdirectories are
+    stored at ``index_path`` together with the filepaths/labels frame. Later
+    scans only stat each directory and list again those whose mtime changed;
+    when no listing changed the cached frame is returned as is.
+    """
+
+    def __init__(self, index_path, root_dir, extensions=IMAGE_EXTENSIONS, max_workers=16):
+        self.index_path = Path(index_path)
+        self.root_dir = root_dir
+        self.extensions = tuple(extensions)
+        self.max_workers = max_workers
+
+    def _load(self):
+        if not self.index_path.exists():
+            return {}, None
+        state = joblib.load(self.index_path)
+        if state['root_dir'] != self.root_dir or state['extensions'] != self.extensions:
+            return {}, None
+        return state['dirs'], state['frame']
+
+    def _visit(self, path, cached):
+        mtime_ns = os.stat(path).st_mtime_ns
+        if cached is not None and cached[0] == mtime_ns:
+            return cached, False
+        files, subdirs, n_entries = scan_directory(path, self.extensions)
+        changed = cached is None or cached[2:] != (files, subdirs)
+        return (mtime_ns, n_entries, files, subdirs), changed
+
+    def scan(self):
+        cached_dirs, frame = self._load()
+        dirs = {}
+        changed = frame is None
+        rescanned = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {executor.submit(self._visit, self.root_dir,
+                                       cached_dirs.get(self.root_dir)): self.root_dir}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    entry, entry_changed = future.result()
+                    dirs[path] = entry
+                    if entry is not cached_dirs.get(path):
+                        rescanned += 1
+                    changed = changed or entry_changed
+                    for subdir in entry[3]:
+                        pending[executor.submit(self._visit, subdir,
+                                                cached_dirs.get(subdir))] = subdir
+        changed = changed or dirs.keys() != cached_dirs.keys()
+
+        if changed:
+            frame = tree_to_frame({path: entry[2]
+                                  for path, entry in dirs.items()})
+        if changed or rescanned:
+            joblib.dump({'root_dir': self.root_dir, 'extensions': self.extensions,
+                         'dirs': dirs, 'frame': frame}, self.index_path)
+        logger.info(
+            f"File index: {len(dirs)} directories, {rescanned} rescanned, frame {'rebuilt' if changed else 'reused'}.")
+        return frame
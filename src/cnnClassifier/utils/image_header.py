@@ -0,0 +1,115 @@
+import struct
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6,
+                0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# source image size columns recorded in the split manifests
+SIZE_COLUMNS = ['image_height', 'image_width']
+
+
+def is_jpeg(data):
+    return bytes(data[:3]) == b'\xff\xd8\xff'
+
+
+def jpeg_size(data):
+    """read (height, width) from the SOF segment of a JPEG
+
+    Args:
+        data (bytes): encoded JPEG, only the bytes up to the SOF segment are needed
+
+    Returns:
+        tuple: (height, width), or None if no SOF segment was found
+    """
+    offset = 2
+    length = len(data)
+    while offset + 4 <= length:
+        if data[offset] != 0xFF:
+            offset += 1
+            continue
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        segment_length = struct.unpack_from('>H', data, offset + 2)[0]
+        if marker in _SOF_MARKERS and offset + 9 <= length:
+            height, width = struct.unpack_from('>HH', data, offset + 5)
+            return height, width
+        offset += 2 + segment_length
+    return None
+
+
+def image_size(data):
+    """read (height, width) from a JPEG or PNG header without decoding
+
+    Args:
+        data (bytes): encoded image
+
+    Returns:
+        tuple: (height, width), or None for other formats
+    """
+    if is_jpeg(data):
+        return jpeg_size(data)
+    if bytes(data[:8]) == _PNG_SIGNATURE and len(data) >= 24:
+        width, height = struct.unpack_from('>II', data, 16)
+        return height, width
+    return None
+
+
+def reduction_factor(source_size, target_size, factors=(8, 4, 2)):
+    """largest JPEG DCT scale factor that keeps the image at least the target size"""
+    height, width = source_size
+    target_height, target_width = target_size
+    for factor in factors:
+        if height // factor >= target_height and width // factor >= target_width:
+            return factor
+    return 1
+
+
+# bytes read to find the size of an image, enough unless a large EXIF block comes first
+HEADER_BYTES = 65536
+
+
+def read_header(path, size=HEADER_BYTES):
+    """image size from the first ``size`` bytes of a file, reading on when the
+    JPEG SOF segment sits further in (e.g. behind a large EXIF thumbnail)"""
+    with open(path, 'rb') as f:
+        data = f.read(size)
+        found = image_size(data)
+        if found is None and len(data) == size:
+            found = image_size(data + f.read())
+    return found
+
+
+def read_image_sizes(paths, read_prefix=None, max_workers=16):
+    """read (height, width) of many images from their headers
+
+    Args:
+        paths (list): image paths or archive member names
+        read_prefix (callable, optional): ``read_prefix(path, size)`` returns the
+            first ``size`` bytes of a path, all of them when size is None;
+            files are opened directly when not given
+        max_workers (int, optional): reader threads
+
+    Returns:
+        np.ndarray: int32 array of shape (n, 2), -1 where the size is unknown
+    """
+    if read_prefix is None:
+        def size_of(path):
+            return read_header(path)
+    else:
+        def size_of(path):
+            data = read_prefix(path, HEADER_BYTES)
+            found = image_size(data)
+            if found is None and len(data) == HEADER_BYTES:
+                found = image_size(read_prefix(path, None))
+            return found
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        sizes = list(executor.map(size_of, paths))
+    return np.array([size or (-1, -1) for size in sizes], dtype=np.int32).reshape(-1, 2)
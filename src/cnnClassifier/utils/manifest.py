@@ -0,0 +1,137 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from cnnClassifier import logger
+
+
+def normalize_path(path):
+    """turn a Windows or mixed-separator path from the config into a posix one"""
+    return os.path.normpath(str(path).replace('\\', '/')).replace('\\', '/')
+
+
+def _string_types(dtype):
+    if dtype == pa.string() or dtype == pa.large_string():
+        return pd.StringDtype('pyarrow')
+    return None
+
+
+def read_source_manifest(source, path_prefix='', path_column='images', label_column='label',
+                         block_size=16 * 1024 * 1024):
+    """read a filepaths/labels manifest csv in streamed blocks
+
+    Paths are normalised to forward slashes and joined to ``path_prefix``
+    with Arrow compute kernels, labels are dictionary encoded so they arrive
+    in pandas as a categorical column.
+
+    Args:
+        source (str or file-like): csv path or readable binary stream
+        path_prefix (str, optional): directory prepended to every path
+        path_column (str, optional): column holding image paths
+        label_column (str, optional): column holding labels
+        block_size (int, optional): bytes parsed per block. Defaults to 16 MB.
+
+    Returns:
+        pd.DataFrame: filepaths and labels columns
+    """
+    reader = pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=[path_column, label_column],
+            column_types={path_column: pa.string(),
+                          label_column: pa.dictionary(pa.int32(), pa.string())}))
+    prefix = f"{normalize_path(path_prefix)}/" if path_prefix else ''
+    batches = []
+    for batch in reader:
+        paths = pc.replace_substring(batch.column(path_column), '\\', '/')
+        if prefix:
+            paths = pc.binary_join_element_wise(prefix, paths, '')
+        batches.append(pa.record_batch([paths, batch.column(label_column)],
+                                       names=['filepaths', 'labels']))
+    schema = pa.schema([('filepaths', pa.string()),
+                        ('labels', pa.dictionary(pa.int32(), pa.string()))])
+    table = pa.Table.from_batches(batches, schema=schema).unify_dictionaries()
+    df = table.to_pandas(types_mapper=_string_types)
+    labels = df['labels'].cat.remove_unused_categories()
+    df['labels'] = labels.cat.reorder_categories(
+        sorted(labels.cat.categories))
+    logger.info(f"manifest loaded with {len(df)} rows in {len(batches)} blocks")
+    return df
+
+
+SPLIT_FORMATS = {'feather': '.feather', 'parquet': '.parquet', 'csv': ''}
+
+
+def split_manifest_path(path, split_format='feather'):
+    """path of a split manifest with the extension of its format"""
+    return f"{path}{SPLIT_FORMATS[split_format]}"
+
+
+def save_split_manifest(df, path, split_format='feather'):
+    """write a train/test/valid split as a columnar manifest
+
+    Filepaths are stored as a dictionary-encoded directory prefix plus the
+    file name, labels as a dictionary column and any other column as is.
+    Feather files are written uncompressed so they can be memory-mapped;
+    parquet files are compressed and always decoded into memory.
+
+    Args:
+        df (pd.DataFrame): split with filepaths and labels columns
+        path (str): manifest path without extension
+        split_format (str, optional): 'feather', 'parquet' or 'csv'
+
+    Returns:
+        str: path of the written manifest
+    """
+    path = split_manifest_path(path, split_format)
+    if split_format == 'csv':
+        df.to_csv(path, index=False)
+        return path
+    parts = pc.extract_regex(pa.array(df['filepaths'].astype(str), type=pa.string()),
+                             r'^(?P<dir>.*[/\\])?(?P<name>[^/\\]*)$')
+    columns = {'dir': pc.struct_field(parts, [0]).dictionary_encode(),
+               'name': pc.struct_field(parts, [1]),
+               'labels': pa.array(df['labels'].astype('category'))}
+    extra = [column for column in df.columns
+             if column not in ('filepaths', 'labels')]
+    table = pa.table(columns)
+    if extra:
+        extra_table = pa.Table.from_pandas(df[extra], preserve_index=False)
+        for name, column in zip(extra_table.column_names, extra_table.columns):
+            table = table.append_column(name, column)
+    if split_format == 'feather':
+        feather.write_feather(table, path, compression='uncompressed')
+    else:
+        pq.write_table(table, path)
+    return path
+
+
+def load_split_manifest(path, split_format='feather'):
+    """read a split manifest written by save_split_manifest
+
+    Only feather manifests are memory-mapped, parquet pages are decompressed
+    and csv is parsed as text.
+
+    Args:
+        path (str): manifest path without extension
+        split_format (str, optional): 'feather', 'parquet' or 'csv'
+
+    Returns:
+        pd.DataFrame: filepaths and labels columns followed by any others
+    """
+    path = split_manifest_path(path, split_format)
+    if split_format == 'csv':
+        return pd.read_csv(path, dtype={'labels': 'category'})
+    if split_format == 'feather':
+        table = feather.read_table(path, memory_map=True)
+    else:
+        table = pq.read_table(path, memory_map=True)
+    filepaths = pc.binary_join_element_wise(
+        table.column('dir').cast(pa.string()), table.column('name'), '')
+    table = table.drop_columns(['dir', 'name']).add_column(
+        0, 'filepaths', filepaths)
+    return table.to_pandas(types_mapper=_string_types)